@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ListingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'alx_travel_app.listings'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,47 @@
+"""Bearer token authentication for API clients.
+
+``BearerTokenAuthentication`` resolves ``Authorization: Bearer <key>``
+without hashing a password: the SHA-256 digest of the key is looked up,
+with its user, in one indexed query. Nothing is cached, so revocations and
+changes to the user (flags, password) apply to the next request in every
+process.
+"""
+from rest_framework import authentication, exceptions
+
+from .models import ApiToken, hash_token_key
+
+
+def resolve_token(digest):
+    """Return the active user owning an unrevoked token digest, or ``None``."""
+    token = ApiToken.objects.select_related('user').filter(
+        key_hash=digest, revoked_at__isnull=True, user__is_active=True,
+    ).first()
+    return token.user if token is not None else None
+
+
+class BearerTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate ``Authorization: Bearer <key>`` requests with an ``ApiToken``.
+
+    ``request.auth`` is set to the token digest.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header. Provide exactly one token.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        digest = hash_token_key(key)
+        user = resolve_token(digest)
+        if user is None:
+            raise exceptions.AuthenticationFailed('Invalid or revoked token.')
+        return user, digest
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,198 @@
+"""Booking availability for listings.
+
+Stays are half-open date ranges ``[check_in, check_out)``: a guest may check
+in on the day the previous guest checks out. Every booking that is not
+cancelled occupies its nights.
+
+When ``settings.AVAILABILITY_CALENDAR`` is on, the occupied nights are also
+materialized as ``ListingNight`` rows that search and the availability
+endpoint read instead of the bookings table. Run ``rebuild_calendar`` after
+turning it on.
+
+On SQLite, reservations are serialized by a lock local to this process, so
+only a single server process may write bookings. If another process books
+the same nights anyway, the calendar's unique constraint rejects the later
+write with ``CalendarConflict``.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Booking, Listing, ListingNight
+
+# SQLite has no row locks, so reservations made by this process are
+# serialized with a process-wide lock instead of ``SELECT ... FOR UPDATE``.
+# Other processes do not see it.
+_sqlite_reservation_lock = threading.Lock()
+
+CONFLICT_MESSAGE = 'The listing is already booked for some of these nights.'
+
+
+class BookingConflict(Exception):
+    """Raised when a stay overlaps an existing booking of the listing."""
+
+
+class CalendarConflict(BookingConflict):
+    """Raised when a night was booked between the availability check and the write."""
+
+
+def active_bookings():
+    """Return the bookings that occupy their nights."""
+    return Booking.objects.exclude(status='cancelled')
+
+
+def overlapping_bookings(listing_id, check_in, check_out):
+    """Return the active bookings of a listing that overlap a stay."""
+    return active_bookings().filter(
+        listing_id=listing_id, check_in__lt=check_out, check_out__gt=check_in,
+    )
+
+
+def calendar_enabled():
+    """Return whether occupied nights are materialized as ``ListingNight`` rows."""
+    return getattr(settings, 'AVAILABILITY_CALENDAR', True)
+
+
+def booked_nights(listing_id, check_in, check_out):
+    """Return the calendar rows of a listing within a stay."""
+    return ListingNight.objects.filter(
+        listing_id=listing_id, date__gte=check_in, date__lt=check_out,
+    )
+
+
+def stay_nights(booking_id, listing_id, check_in, check_out):
+    """Build the unsaved calendar rows covering a stay."""
+    return [
+        ListingNight(listing_id=listing_id, booking_id=booking_id, date=check_in + timedelta(days=i))
+        for i in range((check_out - check_in).days)
+    ]
+
+
+def sync_calendar(booking):
+    """Make the calendar rows of a booking match its dates and status.
+
+    A ``post_save`` receiver calls it in the transaction of every booking
+    save. Raises ``CalendarConflict`` when an active booking would share a
+    night with another one.
+    """
+    if not calendar_enabled():
+        return
+    ListingNight.objects.filter(booking=booking).delete()
+    if booking.status != 'cancelled':
+        write_nights(stay_nights(
+            booking.pk, booking.listing_id, booking.check_in, booking.check_out
+        ))
+
+
+def write_nights(nights):
+    """Insert calendar rows, raising ``CalendarConflict`` if a night is taken.
+
+    The failed insert leaves the transaction to be rolled back, so the
+    exception must leave the enclosing ``atomic`` block.
+    """
+    try:
+        ListingNight.objects.bulk_create(nights)
+    except IntegrityError as exc:
+        raise CalendarConflict(CONFLICT_MESSAGE) from exc
+
+
+def exclude_booked(listings, check_in, check_out):
+    """Keep the listings with no active booking overlapping the stay.
+
+    The overlap test is a correlated ``NOT EXISTS`` over the calendar (or the
+    partial ``booking_active_stay_unique`` index of bookings), so no per-listing
+    queries are made.
+    """
+    if calendar_enabled():
+        occupied = booked_nights(OuterRef('pk'), check_in, check_out)
+    else:
+        occupied = overlapping_bookings(OuterRef('pk'), check_in, check_out)
+    return listings.filter(~Exists(occupied))
+
+
+@contextmanager
+def lock_listing(listing_id):
+    """Hold an exclusive reservation lock on a listing inside a transaction.
+
+    Availability checks and booking writes made inside the block cannot
+    interleave with those of another request for the same listing.
+    """
+    with lock_listings([listing_id]):
+        yield
+
+
+@contextmanager
+def lock_listings(listing_ids):
+    """Hold the reservation locks of several listings inside a transaction.
+
+    Rows are locked in primary key order so that concurrent bulk writes
+    cannot deadlock.
+    """
+    if connection.vendor == 'sqlite':
+        with _sqlite_reservation_lock, transaction.atomic():
+            yield
+        return
+    with transaction.atomic():
+        list(Listing.objects.select_for_update().filter(
+            pk__in=listing_ids
+        ).order_by('pk').values_list('pk'))
+        yield
+
+
+def ensure_available(listing_id, check_in, check_out, exclude=None):
+    """Raise ``BookingConflict`` if the stay overlaps an active booking.
+
+    ``exclude`` is the primary key of a booking being changed, which never
+    conflicts with itself.
+    """
+    conflicts = overlapping_bookings(listing_id, check_in, check_out)
+    if exclude is not None:
+        conflicts = conflicts.exclude(pk=exclude)
+    if conflicts.exists():
+        raise BookingConflict(CONFLICT_MESSAGE)
+
+
+def reserve(save, listing_id, check_in, check_out, exclude=None):
+    """Save a booking for a stay once it is known to be free.
+
+    ``save`` is called under the listing's reservation lock and must return
+    the saved booking, whose calendar rows are written in the same
+    transaction. Raises ``BookingConflict`` when the nights are taken.
+    """
+    with lock_listing(listing_id):
+        ensure_available(listing_id, check_in, check_out, exclude=exclude)
+        return save()
+
+
+def occupied_stays(listing_id, start, end):
+    """Yield the occupied ``(check_in, check_out)`` ranges overlapping a window in order."""
+    if not calendar_enabled():
+        yield from overlapping_bookings(listing_id, start, end).order_by(
+            'check_in'
+        ).values_list('check_in', 'check_out')
+        return
+    one_night = timedelta(days=1)
+    for night in booked_nights(listing_id, start, end).order_by('date').values_list(
+        'date', flat=True
+    ):
+        yield night, night + one_night
+
+
+def free_ranges(listing_id, start, end):
+    """Return the free ``(check_in, check_out)`` ranges of a listing in a window.
+
+    The occupied nights are read with a single query and merged in order.
+    """
+    ranges = []
+    cursor = start
+    for check_in, check_out in occupied_stays(listing_id, start, end):
+        if check_in > cursor:
+            ranges.append((cursor, check_in))
+        cursor = max(cursor, check_out)
+    if cursor < end:
+        ranges.append((cursor, end))
+    return ranges
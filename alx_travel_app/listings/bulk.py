@@ -0,0 +1,259 @@
+"""Bulk listing and booking writes.
+
+``bulk_create``, ``bulk_update`` and ``update()`` send no model signals.
+The functions here therefore do by hand what the receivers in
+``signals.py`` and the booking views do for single writes:
+
+- set listing geohashes;
+- index listings for search;
+- keep the availability calendar in step;
+- append to the change feed;
+- invalidate cached responses.
+
+Rows are inserted with ``insert_rows`` so that their ids are known on
+backends that cannot return them from a bulk insert, such as MySQL.
+
+Each item of a payload is validated on its own. Invalid items are reported
+by index or id, and the valid ones are still written, all in one
+transaction.
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .availability import (
+    CONFLICT_MESSAGE, calendar_enabled, lock_listings, stay_nights, write_nights,
+)
+from .caching import invalidate, listing_tag
+from .models import Booking, Change, Listing, ListingNight, geohash_of
+from .search import get_backend
+
+
+def item_error(message):
+    return {api_settings.NON_FIELD_ERRORS_KEY: [message]}
+
+
+def bulk_items(data, max_items):
+    """Return a bulk payload's items, raising a 400 unless it is a list of objects."""
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise ValidationError(item_error('Expected a list of objects.'))
+    if not 0 < len(data) <= max_items:
+        raise ValidationError(item_error(f'Send between 1 and {max_items} items.'))
+    return data
+
+
+def validate_items(items, make_serializer):
+    """Validate each item with its own serializer.
+
+    ``make_serializer`` returns ``None`` for an item naming an object that
+    does not exist. Returns the ``(index, serializer)`` pairs of valid
+    items and the errors of the others.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        serializer = make_serializer(item)
+        if serializer is None:
+            errors.append({'index': index, 'errors': item_error('Not found.')})
+        elif serializer.is_valid():
+            valid.append((index, serializer))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+    return valid, errors
+
+
+def insert_rows(objects, **owner):
+    """``bulk_create`` rows and make sure their ids are set.
+
+    When the backend cannot return the inserted rows, the new ids, which
+    grow in insertion order, are read back. ``owner`` names the foreign key
+    and the user owning every row, e.g. ``host=user``: their row is locked
+    so that none of their other bulk inserts interleave. Without it, no
+    other process may insert into the table meanwhile. Must run in a
+    transaction.
+    """
+    if not objects:
+        return objects
+    model = type(objects[0])
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects)
+    owned = model.objects.filter(**owner)
+    for user in owner.values():
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+    last = owned.aggregate(last=Max('pk'))['last'] or 0
+    model.objects.bulk_create(objects)
+    ids = list(owned.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True))
+    if len(ids) != len(objects):
+        raise DatabaseError(f'Could not read back the ids of {len(objects)} new rows.')
+    for obj, pk in zip(objects, ids):
+        obj.pk = pk
+    return objects
+
+
+def listings_written(listings):
+    """Index, log and invalidate listings written without signals."""
+    get_backend().index(listings)
+    Change.objects.record('listing', [listing.pk for listing in listings])
+    invalidate(*(listing_tag(listing.pk) for listing in listings), 'listings')
+
+
+def create_listings(serializers, host):
+    """Create the listings of validated ``ListingSerializer`` instances."""
+    listings, amenities = [], []
+    for serializer in serializers:
+        data = dict(serializer.validated_data)
+        amenities.append(data.pop('amenities', []))
+        listing = Listing(host=host, **data)
+        listing.geohash = geohash_of(listing.latitude, listing.longitude)
+        listings.append(listing)
+    with transaction.atomic():
+        insert_rows(listings, host=host)
+        Listing.replace_amenities({
+            listing.pk: names for listing, names in zip(listings, amenities)
+        })
+        listings_written(listings)
+    return listings
+
+
+def update_listings(serializers):
+    """Apply validated partial ``ListingSerializer`` updates with one ``bulk_update``."""
+    now = timezone.now()
+    listings, fields, amenities = [], {'geohash', 'updated_at'}, {}
+    for serializer in serializers:
+        listing, data = serializer.instance, dict(serializer.validated_data)
+        names = data.pop('amenities', None)
+        if names is not None:
+            amenities[listing.pk] = names
+        for name, value in data.items():
+            setattr(listing, name, value)
+        fields.update(data)
+        listing.geohash = geohash_of(listing.latitude, listing.longitude)
+        listing.updated_at = now
+        listings.append(listing)
+    with transaction.atomic():
+        Listing.objects.bulk_update(listings, sorted(fields))
+        if amenities:
+            Listing.replace_amenities(amenities)
+        listings_written(listings)
+    return listings
+
+
+def bookings_written(bookings, nights=()):
+    """Write calendar ``nights`` and log and invalidate bookings written without signals."""
+    if nights and calendar_enabled():
+        write_nights(nights)
+    Change.objects.record_bookings(bookings)
+    invalidate('availability')
+
+
+def key_of(booking):
+    return booking.listing_id, booking.check_in, booking.check_out
+
+
+def overlaps(stays, check_in, check_out):
+    return any(start < check_out and end > check_in for start, end in stays)
+
+
+def taken_stays(bookings, exclude=()):
+    """Map each listing of ``bookings`` to the stays of its other active bookings."""
+    listing_ids = {booking.listing_id for booking in bookings}
+    start = min(booking.check_in for booking in bookings)
+    end = max(booking.check_out for booking in bookings)
+    stays = defaultdict(list)
+    existing = Booking.objects.filter(
+        listing_id__in=listing_ids, check_in__lt=end, check_out__gt=start,
+    ).exclude(status='cancelled').exclude(pk__in=exclude).values_list(
+        'listing_id', 'check_in', 'check_out'
+    )
+    for listing_id, check_in, check_out in existing:
+        stays[listing_id].append((check_in, check_out))
+    return stays
+
+
+def create_bookings(items, guest):
+    """Create the bookings of validated ``(index, BookingCreateSerializer)`` pairs.
+
+    Stays that overlap an active booking, or an earlier item of the
+    batch, are reported instead of created.
+    """
+    candidates = [
+        (index, Booking(guest=guest, **serializer.validated_data))
+        for index, serializer in items
+    ]
+    created, errors = [], []
+    if not candidates:
+        return created, errors
+    bookings = [booking for _, booking in candidates]
+    with lock_listings({booking.listing_id for booking in bookings}):
+        stays = taken_stays(bookings)
+        for index, booking in candidates:
+            listing_id, check_in, check_out = key_of(booking)
+            if overlaps(stays[listing_id], check_in, check_out):
+                errors.append({'index': index, 'errors': item_error(CONFLICT_MESSAGE)})
+                continue
+            stays[listing_id].append((check_in, check_out))
+            created.append(booking)
+        insert_rows(created, guest=guest)
+        bookings_written(created, [
+            night for booking in created
+            for night in stay_nights(booking.pk, *key_of(booking))
+        ])
+    return created, errors
+
+
+def change_status(user, booking_ids, status):
+    """Confirm or cancel many bookings with one ownership-checked ``UPDATE``.
+
+    Hosts may confirm bookings of their listings, and guests and hosts may
+    cancel them, as with the single-booking actions. Confirming a
+    cancelled booking re-checks its nights. Returns the changed booking
+    ids and the errors of the others.
+    """
+    visible_to_user = Q(guest=user) | Q(listing__host=user)
+    owned = Q(listing__host=user) if status == 'confirmed' else visible_to_user
+    visible = Booking.objects.filter(visible_to_user, pk__in=booking_ids).select_related(
+        'listing'
+    ).only('status', 'check_in', 'check_out', 'guest', 'listing__host')
+    found = {booking.pk: booking for booking in visible}
+    errors, allowed = [], []
+    for booking_id in dict.fromkeys(booking_ids):
+        booking = found.get(booking_id)
+        if booking is None:
+            errors.append({'id': booking_id, 'errors': item_error('Not found.')})
+        elif status == 'confirmed' and booking.listing.host_id != user.pk:
+            errors.append({'id': booking_id, 'errors': item_error(
+                'Only the listing host can confirm bookings.'
+            )})
+        else:
+            allowed.append(booking)
+    if not allowed:
+        return [], errors
+
+    cancelled = [booking for booking in allowed if booking.status == 'cancelled']
+    reactivated = cancelled if status == 'confirmed' else []
+    with lock_listings({booking.listing_id for booking in reactivated}):
+        if reactivated:
+            stays = taken_stays(reactivated, exclude=[booking.pk for booking in reactivated])
+            for booking in list(reactivated):
+                listing_id, check_in, check_out = key_of(booking)
+                if overlaps(stays[listing_id], check_in, check_out):
+                    errors.append({'id': booking.pk, 'errors': item_error(CONFLICT_MESSAGE)})
+                    allowed.remove(booking)
+                    reactivated.remove(booking)
+                else:
+                    stays[listing_id].append((check_in, check_out))
+        changed = [booking.pk for booking in allowed]
+        Booking.objects.filter(owned, pk__in=changed).update(
+            status=status, updated_at=timezone.now()
+        )
+        if status == 'cancelled':
+            ListingNight.objects.filter(booking_id__in=changed).delete()
+        bookings_written(allowed, [
+            night for booking in reactivated
+            for night in stay_nights(booking.pk, *key_of(booking))
+        ])
+    return changed, errors
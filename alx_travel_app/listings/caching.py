@@ -0,0 +1,132 @@
+"""Response caching for anonymous listing reads.
+
+Cached responses are keyed by the request and by the current value of
+each version tag they depend on:
+
+- ``all``: every cached listing response
+- ``listings``: anything a listing search can show, bumped by listing,
+  amenity and review writes and by changes to hosts and reviewers
+- ``availability``: searches filtering on ``check_in``/``check_out``,
+  bumped by booking writes
+- ``listing:<id>``: one listing, its host and its reviews
+
+Writes bump tags through signals (see ``signals.py``) or by calling
+``invalidate`` directly for ``update()``-style writes that send no
+signals. A bumped tag changes every key that includes it, so stale entries
+are never read again and simply expire. A tag's value is the time of its
+last bump, which doubles as the ``Last-Modified`` date.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def response_cache():
+    """Return the cache backend configured by ``LISTING_RESPONSE_CACHE``."""
+    return caches[getattr(settings, 'LISTING_RESPONSE_CACHE', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'LISTING_RESPONSE_CACHE_TIMEOUT', 0)
+
+
+def listing_tag(listing_id):
+    return f'listing:{listing_id}'
+
+
+def search_tags(query_params):
+    """Return the tags a listing search depends on; only date searches depend on bookings."""
+    if query_params.get('check_in') or query_params.get('check_out'):
+        return ['listings', 'availability']
+    return ['listings']
+
+
+def version_key(tag):
+    return f'listing-version:{tag}'
+
+
+def get_versions(tags):
+    """Return the current version of each tag, starting missing ones now."""
+    cache = response_cache()
+    keys = [version_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps a version another process started concurrently.
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key, time.time_ns())
+    return [versions[key] for key in keys]
+
+
+def bump(tags):
+    response_cache().set_many({version_key(tag): time.time_ns() for tag in tags}, None)
+
+
+def invalidate(*tags):
+    """Bump version tags now and again when the current transaction commits.
+
+    The second bump drops responses cached from other connections between
+    the write and its commit.
+    """
+    tags = ['all'] if not tags else list(tags)
+    bump(tags)
+    transaction.on_commit(lambda: bump(tags))
+
+
+def response_digest(request, versions):
+    """Hash the request URL, its sorted query parameters, media type and tag versions.
+
+    The scheme and host are included because pagination links are absolute.
+    """
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists() for value in values
+    )
+    parts = [
+        request.scheme, request.get_host(), request.path, urlencode(params),
+        request.accepted_media_type, *map(str, versions),
+    ]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+def cached_response(request, tags, render):
+    """Serve an anonymous GET from the cache, or render and cache it.
+
+    Responses carry an ``ETag`` derived from the key and a ``Last-Modified``
+    date from the tag versions, and conditional requests that still match
+    get a ``304 Not Modified`` without touching the database.
+    """
+    timeout = cache_timeout()
+    if not timeout or request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return render()
+
+    versions = get_versions(['all', *tags])
+    digest = response_digest(request, versions)
+    key = f'listing-response:{digest}'
+    etag = f'"{digest[:32]}"'
+    last_modified = max(versions) // 10 ** 9
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response['ETag'] = etag
+        return response
+
+    data = response_cache().get(key)
+    if data is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+        response_cache().set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+    else:
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Accept', 'Authorization'])
+    return response
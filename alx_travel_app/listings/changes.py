@@ -0,0 +1,91 @@
+"""Change feed for clients that mirror listings and their bookings.
+
+Every listing and booking write appends a ``Change`` row from a signal
+(see ``signals.py``). That covers saves and deletes, plus review and
+amenity writes, which change a listing's representation. ``Change.id``
+grows with every write and is the feed cursor.
+
+Ids are taken when a row is inserted but become visible when its
+transaction commits, so under concurrent writers a lower id can appear
+after a higher one was read. The feed therefore serves only changes older
+than ``CHANGE_FEED_DELAY`` seconds and stops at the first newer one.
+Transactions writing changes must commit within that delay.
+
+``GET /api/changes/?cursor=<id>`` returns the changes after ``cursor``,
+oldest first. Each one carries the record's current representation, or
+marks it deleted. A record changed several times within a page appears
+once. Bookings are only shown to their guest and to their listing's host.
+
+A client starts with the ``cursor`` returned by a request without one,
+downloads everything (e.g. from the ``export`` actions) and then polls
+with the cursor each page returns. Replaying a change is harmless, since
+it carries the current state. Once ``prune_changes`` has dropped the
+changes after a client's cursor, the feed answers ``410 Gone`` and the
+client must download everything again.
+
+Writes that send no signals, such as ``update()`` and ``bulk_create()``,
+must append their changes with ``Change.objects.record()``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Change
+
+RESOURCES = {'listings': 'listing', 'bookings': 'booking'}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def settled_before():
+    """Return the time before which changes are served."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'CHANGE_FEED_DELAY', 0))
+
+
+def latest_cursor():
+    """Return the cursor of the last change before the first one still settling."""
+    settling = Change.objects.filter(created_at__gt=settled_before()).aggregate(first=Min('pk'))
+    if settling['first'] is not None:
+        return settling['first'] - 1
+    return Change.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def cursor_expired(cursor):
+    """Return whether changes after ``cursor`` may have been pruned."""
+    oldest = Change.objects.order_by('pk').values_list('pk', flat=True).first()
+    return oldest is not None and cursor < oldest - 1
+
+
+def visible_changes(user, resources):
+    """Return the changes of ``resources`` that ``user`` may see."""
+    visible = Q(pk__in=[])
+    if 'listing' in resources:
+        visible |= Q(resource='listing')
+    if 'booking' in resources and user.is_authenticated:
+        visible |= Q(resource='booking') & (Q(guest_id=user.pk) | Q(host_id=user.pk))
+    return Change.objects.filter(visible)
+
+
+def read_changes(user, resources, cursor, limit):
+    """Return the latest change per record after ``cursor``, the next cursor and ``has_more``.
+
+    At most ``limit`` changes are read, up to the first one younger than
+    ``CHANGE_FEED_DELAY``; the returned changes are in the order of each
+    record's last change.
+    """
+    changes = list(visible_changes(user, resources).filter(pk__gt=cursor)[:limit + 1])
+    threshold = settled_before()
+    settled = next(
+        (index for index, change in enumerate(changes) if change.created_at > threshold),
+        len(changes),
+    )
+    has_more = settled > limit
+    changes = changes[:min(settled, limit)]
+    latest = {}
+    for change in changes:
+        key = (change.resource, change.object_id)
+        latest.pop(key, None)
+        latest[key] = change
+    return list(latest.values()), changes[-1].pk if changes else cursor, has_more
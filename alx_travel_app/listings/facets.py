@@ -0,0 +1,76 @@
+"""Facet counts for listing search.
+
+``listing_facets`` summarizes a filtered listing queryset into the
+histograms shown next to each search filter. It always runs the same five
+grouped aggregate queries, however many facet values there are.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+# Lower bounds of the price buckets; the last bucket is open-ended.
+PRICE_BUCKETS = [0, 50, 100, 200, 300, 500]
+
+# Query parameters that shape the response page but not the filtered set.
+NON_FILTER_PARAMS = {'page', 'page_size', 'pagination', 'cursor', 'ordering', 'fields', 'omit', 'expand'}
+
+
+def price_ranges():
+    """Return the ``(min, max)`` price buckets; ``max`` is exclusive and ``None`` for the last."""
+    bounds = getattr(settings, 'LISTING_PRICE_BUCKETS', PRICE_BUCKETS)
+    return list(zip(bounds, [*bounds[1:], None]))
+
+
+def price_range_q(low, high):
+    """Match prices in ``[low, high)``."""
+    if high is None:
+        return Q(price__gte=low)
+    return Q(price__gte=low, price__lt=high)
+
+
+def value_counts(listings, field):
+    """Count listings per distinct value of ``field``."""
+    return [
+        {'value': row[field], 'count': row['count']}
+        for row in listings.values(field).annotate(count=Count('pk')).order_by(field)
+    ]
+
+
+def listing_facets(queryset):
+    """Return the total and the facet histograms of a filtered listing queryset."""
+    listings = queryset.order_by()
+    ranges = price_ranges()
+    buckets = {
+        f'price_{i}': Count('pk', filter=price_range_q(low, high))
+        for i, (low, high) in enumerate(ranges)
+    }
+    totals = listings.aggregate(total=Count('pk'), **buckets)
+    return {
+        'total': totals['total'],
+        'property_type': value_counts(listings, 'property_type'),
+        'bedrooms': value_counts(listings, 'bedrooms'),
+        'is_available': value_counts(listings, 'is_available'),
+        'price': [
+            {'min': low, 'max': high, 'count': totals[f'price_{i}']}
+            for i, (low, high) in enumerate(ranges)
+        ],
+        'amenities': list(listings.amenity_counts()),
+    }
+
+
+def facets_cache_key(query_params, versions):
+    """Build a cache key from the filter parameters, ignoring order and paging.
+
+    ``versions`` are the response cache tag versions, so that listing
+    writes change the key.
+    """
+    items = sorted(
+        (name, value)
+        for name, values in query_params.lists() if name not in NON_FILTER_PARAMS
+        for value in values
+    )
+    items.extend(('version', str(version)) for version in versions)
+    digest = hashlib.sha256(urlencode(items).encode()).hexdigest()
+    return f'listing-facets:{digest}'
@@ -0,0 +1,134 @@
+"""Precompiled read path for model serializers.
+
+DRF's ``Serializer.to_representation`` walks the readable fields for every
+object: it resolves each field's source through ``get_attribute``, checks
+for ``PKOnlyObject`` and fills an ``OrderedDict``. On list pages that
+bookkeeping costs more than the values themselves.
+
+``FastRepresentationMixin`` builds a list of ``(name, accessor)`` pairs
+once per serializer instance, and therefore once per list, and reuses it
+for every object. The output is the same:
+
+- plain attributes are read with ``getattr`` and passed to the field's own
+  ``to_representation``, so decimals, dates and choices are formatted by DRF;
+- ISO 8601 datetimes are converted to the current timezone, which is looked
+  up once per plan rather than once per value;
+- primary key relations read the ``<name>_id`` column, which is what DRF
+  returns without loading the related row;
+- method fields call the bound serializer method directly;
+- nested serializers use their own compiled accessors.
+
+Fields with dotted sources or custom ``get_attribute`` logic fall back to
+DRF's per-field handling. Set ``FAST_READ_SERIALIZERS = False`` to use
+DRF's representation everywhere.
+"""
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+from .metrics import timed_serialization
+
+_SKIP = object()
+
+
+def fast_reads_enabled():
+    return getattr(settings, 'FAST_READ_SERIALIZERS', True)
+
+
+def model_field(serializer, attr):
+    """Return the model field named ``attr`` that a plain ``getattr`` can read."""
+    try:
+        field = serializer.Meta.model._meta.get_field(attr)
+    except (AttributeError, FieldDoesNotExist):
+        return None
+    # Missing reverse one-to-one rows raise instead of returning None.
+    return None if field.one_to_one and field.auto_created else field
+
+
+def field_accessor(serializer, field):
+    """Return a function mapping an instance to ``field``'s representation."""
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+    if field.source == '*' or len(field.source_attrs) != 1:
+        return generic_accessor(field)
+    attr = field.source_attrs[0]
+    source = model_field(serializer, attr)
+    if type(field) is serializers.PrimaryKeyRelatedField:
+        target = getattr(source, 'target_field', None)
+        if target is not None and target.primary_key and source.concrete and field.pk_field is None:
+            attname = source.attname
+            return lambda instance: getattr(instance, attname)
+        return generic_accessor(field)
+    if source is None or type(field).get_attribute is not serializers.Field.get_attribute:
+        return generic_accessor(field)
+    if type(field) is serializers.DateTimeField:
+        return datetime_accessor(field, attr)
+
+    to_representation = field.to_representation
+
+    def accessor(instance):
+        value = getattr(instance, attr)
+        return None if value is None else to_representation(value)
+    return accessor
+
+
+def datetime_accessor(field, attr):
+    """Format ISO 8601 datetimes with the field's timezone looked up once."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        to_representation = field.to_representation
+        return lambda instance: to_representation(getattr(instance, attr))
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    enforce_timezone = field.enforce_timezone
+
+    def accessor(instance):
+        value = getattr(instance, attr)
+        if not value:
+            return None
+        if isinstance(value, str):
+            return value
+        if field_timezone is not None and timezone.is_aware(value):
+            value = value.astimezone(field_timezone).isoformat()
+        else:
+            value = enforce_timezone(value).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return accessor
+
+
+def generic_accessor(field):
+    """Represent ``field`` the way ``Serializer.to_representation`` does."""
+    def accessor(instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return _SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else field.to_representation(attribute)
+    return accessor
+
+
+class FastRepresentationMixin:
+    """Represent instances with accessors compiled from the readable fields."""
+
+    def representation_plan(self):
+        plan = getattr(self, '_representation_plan', None)
+        if plan is None:
+            plan = self._representation_plan = [
+                (field.field_name, field_accessor(self, field)) for field in self._readable_fields
+            ]
+        return plan
+
+    @timed_serialization
+    def to_representation(self, instance):
+        if not fast_reads_enabled():
+            return super().to_representation(instance)
+        representation = {}
+        for name, accessor in self.representation_plan():
+            value = accessor(instance)
+            if value is not _SKIP:
+                representation[name] = value
+        return representation
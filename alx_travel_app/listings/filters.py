@@ -0,0 +1,104 @@
+from django import forms
+from django.db.models import Count, FloatField, Value
+from django.utils.text import slugify
+from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
+
+from .availability import exclude_booked
+from .geo import within_radius
+from .models import Listing, ListingAmenity
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+
+
+class ListingFilterForm(forms.Form):
+    """Validates stays as complete, ordered date ranges and proximity searches."""
+
+    def clean_near(self):
+        value = self.cleaned_data.get('near')
+        if not value:
+            return None
+        try:
+            latitude, longitude = (float(part) for part in value.split(','))
+        except ValueError:
+            raise forms.ValidationError('Enter a point as "latitude,longitude".')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise forms.ValidationError('Latitude must be within ±90 and longitude within ±180.')
+        return latitude, longitude
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in = cleaned_data.get('check_in')
+        check_out = cleaned_data.get('check_out')
+        if bool(check_in) != bool(check_out):
+            raise forms.ValidationError('Provide both check_in and check_out.')
+        if check_in and check_out and check_out <= check_in:
+            raise forms.ValidationError('check_out must be after check_in.')
+        radius = cleaned_data.get('radius')
+        if radius is not None and not cleaned_data.get('near'):
+            raise forms.ValidationError('radius requires near.')
+        if radius is not None and not 0 < radius <= MAX_RADIUS_KM:
+            raise forms.ValidationError(f'radius must be between 0 and {MAX_RADIUS_KM} km.')
+        return cleaned_data
+
+
+class ListingFilter(filters.FilterSet):
+    """Listing filters, including availability for a stay.
+
+    ``check_in``/``check_out`` drop listings with an overlapping active
+    booking, ``guests`` keeps listings that can host that many people and
+    ``amenities`` keeps listings offering every listed amenity.
+    ``near=lat,lng`` with ``radius`` (km) keeps listings within that distance
+    and annotates their ``distance``, which is ``None`` otherwise.
+    """
+    check_in = filters.DateFilter(method='filter_stay')
+    check_out = filters.DateFilter(method='filter_stay')
+    guests = filters.NumberFilter(field_name='max_guests', lookup_expr='gte')
+    amenities = filters.CharFilter(method='filter_amenities')
+    near = filters.CharFilter(method='filter_near')
+    radius = filters.NumberFilter(method='filter_near')
+
+    class Meta:
+        model = Listing
+        form = ListingFilterForm
+        fields = ['property_type', 'is_available', 'bedrooms', 'bathrooms', 'host']
+
+    def filter_stay(self, queryset, name, value):
+        # Both dates are needed at once, so the stay is applied in filter_queryset.
+        return queryset
+
+    def filter_near(self, queryset, name, value):
+        # The point and radius are needed at once, so they are applied in filter_queryset.
+        return queryset
+
+    def filter_amenities(self, queryset, name, value):
+        """Keep listings linked to all of the comma-separated amenity slugs or names."""
+        slugs = {slugify(amenity) for amenity in value.split(',')} - {''}
+        if not slugs:
+            return queryset
+        matching = ListingAmenity.objects.filter(amenity__slug__in=slugs).values(
+            'listing'
+        ).annotate(matched=Count('amenity')).filter(matched=len(slugs)).values('listing')
+        return queryset.filter(pk__in=matching)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        check_in = self.form.cleaned_data.get('check_in')
+        check_out = self.form.cleaned_data.get('check_out')
+        if check_in and check_out:
+            queryset = exclude_booked(queryset, check_in, check_out)
+        near = self.form.cleaned_data.get('near')
+        if not near:
+            return queryset.annotate(distance=Value(None, output_field=FloatField()))
+        radius = self.form.cleaned_data.get('radius') or DEFAULT_RADIUS_KM
+        return within_radius(queryset, *near, float(radius))
+
+
+class ListingOrderingFilter(OrderingFilter):
+    """Ordering that lists the nearest listings first for proximity searches."""
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get('near'):
+            return ['distance', 'pk']
+        return super().get_default_ordering(view)
@@ -0,0 +1,113 @@
+"""Proximity search for listings.
+
+Listings store a geohash of their coordinates. Nearby candidates are found
+by covering the search circle's bounding box with a handful of geohash
+cells, each an index range scan on ``Listing.geohash``. Only those rows get
+the exact haversine distance computed in SQL.
+"""
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Most cells a search may cover; coarser cells are used until the box fits.
+MAX_CELLS = 16
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point."""
+    ranges = {'lng': [-180.0, 180.0], 'lat': [-90.0, 90.0]}
+    chars = []
+    bits = value = 0
+    use_lng = True
+    while len(chars) < precision:
+        bounds, coordinate = (ranges['lng'], longitude) if use_lng else (ranges['lat'], latitude)
+        mid = (bounds[0] + bounds[1]) / 2
+        if coordinate >= mid:
+            value = value << 1 | 1
+            bounds[0] = mid
+        else:
+            value <<= 1
+            bounds[1] = mid
+        use_lng = not use_lng
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the ``(latitude, longitude)`` size in degrees of a geohash cell."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(min_lat, min_lng, max_lat, max_lng)`` around a circle.
+
+    Longitudes may fall outside ``[-180, 180]`` when the box crosses the
+    antimeridian; near the poles the box spans every longitude.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 90:
+        return min_lat, -180.0, max_lat, 180.0
+    lng_delta = min(lat_delta / math.cos(math.radians(widest)), 180.0)
+    return min_lat, longitude - lng_delta, max_lat, longitude + lng_delta
+
+
+def covering_cells(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_CELLS):
+    """Return the finest geohash cells, at most ``max_cells``, covering a box."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lng_step = cell_size(precision)
+        first_row = math.floor((min_lat + 90) / lat_step)
+        last_row = min(math.floor((max_lat + 90) / lat_step), round(180 / lat_step) - 1)
+        first_col = math.floor((min_lng + 180) / lng_step)
+        last_col = math.floor((max_lng + 180) / lng_step)
+        rows = last_row - first_row + 1
+        cols = min(last_col - first_col + 1, round(360 / lng_step))
+        if rows * cols <= max_cells:
+            return sorted({
+                encode(
+                    (first_row + row + 0.5) * lat_step - 90,
+                    ((first_col + col + 0.5) * lng_step) % 360 - 180,
+                    precision,
+                )
+                for row in range(rows) for col in range(cols)
+            })
+    return ['']
+
+
+def cell_filter(cells):
+    """Match geohashes inside any of ``cells`` with index range lookups."""
+    # '~' sorts after every geohash character, so [cell, cell + '~') is the prefix range.
+    return reduce(or_, (Q(geohash__gte=cell, geohash__lt=f'{cell}~') for cell in cells))
+
+
+def distance_km(latitude, longitude):
+    """Haversine distance in kilometres from a point to the listing coordinates."""
+    lat, lng = math.radians(latitude), math.radians(longitude)
+    half_chord = (
+        Power(Sin((Radians(F('latitude')) - Value(lat)) / 2), 2)
+        + Value(math.cos(lat)) * Cos(Radians(F('latitude')))
+        * Power(Sin((Radians(F('longitude')) - Value(lng)) / 2), 2)
+    )
+    return ExpressionWrapper(
+        Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(half_chord)), output_field=FloatField()
+    )
+
+
+def within_radius(listings, latitude, longitude, radius_km):
+    """Keep listings within ``radius_km`` of a point, annotated with their ``distance``."""
+    cells = covering_cells(*bounding_box(latitude, longitude, radius_km))
+    return listings.filter(cell_filter(cells)).annotate(
+        distance=distance_km(latitude, longitude)
+    ).filter(distance__lte=radius_km)
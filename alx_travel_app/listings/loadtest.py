@@ -0,0 +1,436 @@
+"""Weighted HTTP load test of the API.
+
+Each virtual user runs in its own thread and replays scenarios, picked by
+weight from ``SCENARIOS`` with a ``random.Random`` seeded from the run seed
+and the user's number. A seed therefore replays the same requests against
+the same dataset (see ``seed --bulk --seed``).
+
+Requests go either through the WSGI or ASGI stack in this process
+(``InProcessTarget``, ``AsgiTarget``), which also count the SQL queries of
+each request, or to a server at a URL (``HttpTarget``). In-process requests
+use a host ``ALLOWED_HOSTS`` accepts. Booking scenarios run as dedicated
+``loadtest-*`` users on listings of their own. ``prepare()`` creates them
+in the database, so a server must use the same database. ``teardown()``
+deletes them with everything they booked.
+
+Results are summarized per endpoint as JSON-serializable dicts, which
+``compare()`` checks against the results of an earlier run.
+"""
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.db import connection
+from django.http.request import validate_host
+from django.test import Client
+from rest_framework.settings import api_settings
+
+from .models import ApiToken, Listing
+from .synthetic import LOCATIONS, PROPERTY_TYPES
+
+LOADTEST_USERNAME_PREFIX = 'loadtest-'
+SEARCH_TERMS = ['apartment', 'beach', 'cabin', 'city', 'garden', 'loft', 'pool', 'villa']
+AMENITY_FILTERS = ['wifi', 'pool', 'kitchen,parking', 'gym,balcony', 'hot-tub']
+# Booking scenarios book disjoint far-future stays of at most a week, so
+# concurrent users never conflict and the dataset's calendar is untouched.
+STAY_START = date(2100, 1, 1)
+STAY_SLOT_DAYS = 8
+SAMPLED_LISTINGS = 10000
+BROWSED_PAGES = 20
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` counting the queries it lets through."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def allowed_host():
+    """Return a host name that ``ALLOWED_HOSTS`` accepts, preferring ``testserver``."""
+    allowed = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed:
+        allowed = ['.localhost', '127.0.0.1', '[::1]']
+    for host in ['testserver', *allowed]:
+        host = host.lstrip('.')
+        if host != '*' and validate_host(host, allowed):
+            return host
+    return 'testserver'
+
+
+class InProcessTarget:
+    """Send requests through Django's test client, with the full middleware stack."""
+    name = 'in-process'
+
+    def __init__(self):
+        self.local = threading.local()
+        self.host = allowed_host()
+
+    def request(self, method, path, body, headers):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(raise_request_exception=False, HTTP_HOST=self.host)
+        extra = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = client.generic(
+                method, path, body or '', content_type='application/json', **extra
+            )
+        return response.status_code, response.content, counter.count
+
+    def close(self):
+        connection.close()
+
+
+class AsgiTarget:
+    """Send requests to the project's ASGI application, one event loop per thread.
+
+    Views are synchronous, so the handler runs them in the calling thread,
+    where its queries are counted.
+    """
+    name = 'in-process-asgi'
+
+    def __init__(self):
+        self.application = get_asgi_application()
+        self.host = allowed_host()
+
+    def request(self, method, path, body, headers):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            status, content = async_to_sync(self.send)(method, path, body, headers)
+        return status, content, counter.count
+
+    async def send(self, method, path, body, headers):
+        path, _, query = path.partition('?')
+        body = (body or '').encode()
+        headers = {
+            'Host': self.host, 'Content-Type': 'application/json',
+            'Content-Length': str(len(body)), **headers,
+        }
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await self.application(scope, receive, send)
+        content = b''.join(
+            message.get('body', b'') for message in messages
+            if message['type'] == 'http.response.body'
+        )
+        return messages[0]['status'], content
+
+    def close(self):
+        connection.close()
+
+
+class HttpTarget:
+    """Send requests over one keep-alive connection per thread to a running server."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.name = url
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def request(self, method, path, body, headers):
+        headers = {'Content-Type': 'application/json', **headers}
+        for attempt in range(2):
+            conn = getattr(self.local, 'connection', None)
+            if conn is None:
+                conn = self.local.connection = self.connection_class(self.netloc, timeout=30)
+            try:
+                conn.request(method, self.prefix + path, body, headers)
+                response = conn.getresponse()
+                return response.status, response.read(), None
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; reconnect once.
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        conn = getattr(self.local, 'connection', None)
+        if conn is not None:
+            conn.close()
+            self.local.connection = None
+
+
+class Fixture:
+    """The ids and tokens the scenarios use."""
+
+    def __init__(self, listing_ids, stay_listing_ids, host_key, guest_keys):
+        self.listing_ids = listing_ids
+        self.stay_listing_ids = stay_listing_ids
+        self.host_key = host_key
+        self.guest_keys = guest_keys
+
+
+def teardown():
+    """Delete the load-test users and everything they own or booked."""
+    User.objects.filter(username__startswith=LOADTEST_USERNAME_PREFIX).delete()
+
+
+def prepare(guests, stay_listings=10):
+    """Create a host with ``stay_listings`` listings and ``guests`` guests, with tokens."""
+    listing_ids = list(
+        Listing.objects.order_by('pk').values_list('pk', flat=True)[:SAMPLED_LISTINGS]
+    )
+    if not listing_ids:
+        return None
+    teardown()
+    host = User.objects.create_user(username=f'{LOADTEST_USERNAME_PREFIX}host')
+    stay_listing_ids = [
+        Listing.objects.create(
+            host=host, title=f'Load test listing {i}', description='Booked by load tests.',
+            price=Decimal('100.00'), location='Load test',
+        ).pk
+        for i in range(stay_listings)
+    ]
+    guest_keys = []
+    for i in range(guests):
+        guest = User.objects.create_user(username=f'{LOADTEST_USERNAME_PREFIX}guest-{i}')
+        guest_keys.append(ApiToken.issue(guest, name='loadtest')[1])
+    host_key = ApiToken.issue(host, name='loadtest')[1]
+    return Fixture(listing_ids, stay_listing_ids, host_key, guest_keys)
+
+
+class Session:
+    """One virtual user: sends requests and records a sample for each."""
+
+    def __init__(self, target, fixture, index, users):
+        self.target = target
+        self.fixture = fixture
+        self.index = index
+        self.users = users
+        self.guest_key = fixture.guest_keys[index]
+        self.stays = 0
+        self.recording = False
+        self.samples = []
+
+    def request(self, endpoint, method, path, data=None, key=None, expect=200):
+        """Send a request, record it under ``endpoint`` and return its JSON on success."""
+        headers = {'Authorization': f'Bearer {key}'} if key else {}
+        body = json.dumps(data) if data is not None else None
+        start = time.perf_counter()
+        status, content, queries = self.target.request(method, path, body, headers)
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.samples.append((endpoint, elapsed, status == expect, queries))
+        return json.loads(content) if status == expect and content else None
+
+    def get(self, endpoint, path, params=None):
+        if params:
+            path = f'{path}?{urlencode(params)}'
+        return self.request(endpoint, 'GET', path)
+
+    def next_stay(self):
+        """Return a stay no other virtual user or iteration books."""
+        slot = self.stays * self.users + self.index
+        self.stays += 1
+        check_in = STAY_START + timedelta(days=slot * STAY_SLOT_DAYS)
+        return check_in, check_in + timedelta(days=1 + slot % (STAY_SLOT_DAYS - 1))
+
+
+def browse(session, rng):
+    pages = min(BROWSED_PAGES, math.ceil(len(session.fixture.listing_ids) / api_settings.PAGE_SIZE))
+    session.get('listings:list', '/api/listings/', {'page': rng.randint(1, pages)})
+
+
+def search(session, rng):
+    session.get('listings:search', '/api/listings/', {'search': rng.choice(SEARCH_TERMS)})
+
+
+def filter_listings(session, rng):
+    params = {
+        'property_type': rng.choice(PROPERTY_TYPES),
+        'guests': rng.randint(1, 4),
+        'ordering': rng.choice(['price', '-price', '-average_rating']),
+    }
+    kind = rng.choice(['amenities', 'stay', 'near'])
+    if kind == 'amenities':
+        params['amenities'] = rng.choice(AMENITY_FILTERS)
+    elif kind == 'stay':
+        check_in = date.today() + timedelta(days=rng.randint(1, 90))
+        params['check_in'] = check_in.isoformat()
+        params['check_out'] = (check_in + timedelta(days=rng.randint(1, 7))).isoformat()
+    else:
+        latitude, longitude = LOCATIONS[rng.choice(list(LOCATIONS))]
+        params.update(near=f'{latitude},{longitude}', radius=rng.choice([2, 5, 10]))
+        params['ordering'] = 'distance'
+    session.get(f'listings:filter:{kind}', '/api/listings/', params)
+
+
+def detail(session, rng):
+    session.get('listings:detail', f'/api/listings/{rng.choice(session.fixture.listing_ids)}/')
+
+
+def listing_reviews(session, rng):
+    listing_id = rng.choice(session.fixture.listing_ids)
+    session.get('listings:reviews', f'/api/listings/{listing_id}/reviews/')
+
+
+def book(session, rng):
+    """Book a stay as the guest, confirm it as the host, then cancel it as the guest."""
+    check_in, check_out = session.next_stay()
+    booking = session.request('bookings:create', 'POST', '/api/bookings/', {
+        'listing': rng.choice(session.fixture.stay_listing_ids),
+        'check_in': check_in.isoformat(),
+        'check_out': check_out.isoformat(),
+        'total_price': '100.00',
+    }, key=session.guest_key, expect=201)
+    if booking is None:
+        return
+    path = f"/api/bookings/{booking['id']}"
+    session.request('bookings:confirm', 'PATCH', f'{path}/confirm/', key=session.fixture.host_key)
+    session.request('bookings:cancel', 'PATCH', f'{path}/cancel/', key=session.guest_key)
+
+
+SCENARIOS = {
+    'browse': (browse, 30),
+    'search': (search, 15),
+    'filter': (filter_listings, 20),
+    'detail': (detail, 20),
+    'reviews': (listing_reviews, 5),
+    'book': (book, 10),
+}
+
+
+def parse_mix(text):
+    """Parse ``name=weight,...`` into scenario weights, raising ``ValueError`` when invalid."""
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}.')
+        weights[name] = float(weight)
+        if weights[name] < 0:
+            raise ValueError(f'The weight of {name} cannot be negative.')
+    if not any(weights.values()):
+        raise ValueError('At least one scenario needs a positive weight.')
+    return weights
+
+
+def run(target, fixture, weights, concurrency, iterations, warmup, seed):
+    """Run ``concurrency`` virtual users; return their samples and the timed seconds.
+
+    Each user first runs ``warmup`` unrecorded scenarios. Timing starts
+    once every user has warmed up.
+    """
+    names = [name for name, weight in weights.items() if weight]
+    scenario_weights = [weights[name] for name in names]
+    started = []
+    barrier = threading.Barrier(concurrency, action=lambda: started.append(time.perf_counter()))
+
+    def virtual_user(index):
+        rng = random.Random(f'{seed}:{index}')
+        session = Session(target, fixture, index, concurrency)
+        try:
+            for iteration in range(warmup + iterations):
+                if iteration == warmup:
+                    barrier.wait()
+                    session.recording = True
+                name = rng.choices(names, scenario_weights)[0]
+                SCENARIOS[name][0](session, rng)
+            return session.samples
+        except BaseException:
+            barrier.abort()
+            raise
+        finally:
+            target.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(virtual_user, index) for index in range(concurrency)]
+        samples = [sample for future in futures for sample in future.result()]
+    return samples, time.perf_counter() - started[0]
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of sorted values."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Return latency, throughput, error and query statistics per endpoint and in total."""
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+
+    def stats(group):
+        latencies = sorted(seconds * 1000 for _, seconds, _, _ in group)
+        # Failed requests often stop early, so only successful ones count queries.
+        queries = [count for _, _, ok, count in group if ok and count is not None]
+        return {
+            'requests': len(group),
+            'errors': sum(not ok for _, _, ok, _ in group),
+            'rps': round(len(group) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'queries_per_request': (
+                round(sum(queries) / len(queries), 2) if queries else None
+            ),
+        }
+
+    return {
+        'endpoints': {name: stats(group) for name, group in sorted(by_endpoint.items())},
+        'total': stats(samples) if samples else None,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Compare two ``summarize()`` results endpoint by endpoint.
+
+    Returns ``(endpoint, metric, before, after, regressed)`` rows. p95
+    latency and requests per second regress when they worsen by more than
+    ``tolerance`` percent, and queries per request when they grow at all.
+    """
+    rows = []
+    for name, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        limit = 1 + tolerance / 100
+        checks = [
+            ('p95_ms', after['p95_ms'] > before['p95_ms'] * limit),
+            ('rps', after['rps'] * limit < before['rps']),
+        ]
+        queries_before, queries_after = before['queries_per_request'], after['queries_per_request']
+        if queries_before is not None and queries_after is not None:
+            checks.append(('queries_per_request', queries_after > queries_before))
+        rows.extend(
+            (name, metric, before[metric], after[metric], regressed)
+            for metric, regressed in checks
+        )
+    return rows
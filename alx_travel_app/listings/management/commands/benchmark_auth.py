@@ -0,0 +1,64 @@
+import base64
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from alx_travel_app.listings.authentication import BearerTokenAuthentication
+from alx_travel_app.listings.models import ApiToken
+
+
+class WhoAmIView(APIView):
+    """Minimal authenticated endpoint, so that timings measure authentication."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'user': request.user.pk})
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second of Basic and bearer token authentication. '
+        'The benchmark user and token are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Number of requests per scheme (default: 50)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='benchmark-auth', password='benchmark-password'
+            )
+            _, key = ApiToken.issue(user, name='benchmark')
+            basic = base64.b64encode(b'benchmark-auth:benchmark-password').decode()
+            schemes = [
+                ('basic', BasicAuthentication, f'Basic {basic}'),
+                ('token', BearerTokenAuthentication, f'Bearer {key}'),
+            ]
+            for name, authentication_class, header in schemes:
+                view = WhoAmIView.as_view(authentication_classes=[authentication_class])
+                start = time.perf_counter()
+                for _ in range(count):
+                    response = view(factory.get('/', HTTP_AUTHORIZATION=header))
+                    if response.status_code != 200:
+                        self.stderr.write(f'{name}: unexpected status {response.status_code}')
+                        break
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{name:>5}: {count / elapsed:.1f} requests/s '
+                    f'({elapsed / count * 1000:.2f} ms per request)'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from alx_travel_app.listings.geo import distance_km, within_radius
+from alx_travel_app.listings.models import Listing, geohash_of
+
+# Search centres; generated listings are spread around them.
+CITIES = [
+    (40.7128, -74.0060), (34.0522, -118.2437), (41.8781, -87.6298), (29.7604, -95.3698),
+    (25.7617, -80.1918), (47.6062, -122.3321), (39.7392, -104.9903), (30.2672, -97.7431),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time ?near= proximity searches against a full haversine scan on generated '
+        'listings. Everything runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listings',
+            type=int,
+            default=300000,
+            help='Number of listings to generate (default: 300000)',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=20,
+            help='Number of searches to time per strategy (default: 20)',
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=10,
+            help='Search radius in km (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with transaction.atomic():
+            self.generate(rng, options['listings'])
+            points = [
+                self.jitter(rng, *rng.choice(CITIES), spread=0.3)
+                for _ in range(options['queries'])
+            ]
+            radius = options['radius']
+
+            def proximity(point):
+                return list(within_radius(Listing.objects.all(), *point, radius).order_by(
+                    'distance', 'pk'
+                ).values_list('pk', flat=True)[:10])
+
+            def full_scan(point):
+                return list(Listing.objects.annotate(distance=distance_km(*point)).filter(
+                    distance__lte=radius
+                ).order_by('distance', 'pk').values_list('pk', flat=True)[:10])
+
+            for point in points[:3]:
+                if proximity(point) != full_scan(point):
+                    self.stderr.write(self.style.WARNING(f'Results differ near {point}'))
+            for name, search in (('proximity', proximity), ('full scan', full_scan)):
+                self.report(name, [self.timed(search, point) for point in points])
+            transaction.set_rollback(True)
+
+    def generate(self, rng, count):
+        self.stdout.write(f'Generating {count} listings...')
+        host = User.objects.create_user(username=f'benchmark-{rng.getrandbits(32):08x}')
+        batch = []
+        for i in range(count):
+            latitude, longitude = self.jitter(rng, *rng.choice(CITIES), spread=2.0)
+            batch.append(Listing(
+                title=f'Listing {i}', description='Generated for benchmarking.',
+                price=Decimal(rng.randint(50, 500)), location='Benchmark',
+                latitude=latitude, longitude=longitude,
+                geohash=geohash_of(latitude, longitude), host=host,
+            ))
+            if len(batch) == 5000:
+                Listing.objects.bulk_create(batch)
+                batch = []
+        Listing.objects.bulk_create(batch)
+
+    def jitter(self, rng, latitude, longitude, spread):
+        return latitude + rng.uniform(-spread, spread), longitude + rng.uniform(-spread, spread)
+
+    def timed(self, search, point):
+        start = time.perf_counter()
+        search(point)
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, name, timings):
+        self.stdout.write(
+            f'{name:>10}: median {statistics.median(timings):.1f} ms, '
+            f'max {max(timings):.1f} ms over {len(timings)} searches'
+        )
@@ -0,0 +1,108 @@
+import datetime
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from alx_travel_app.listings.models import Booking, Listing, Review
+from alx_travel_app.listings.serializers import (
+    BookingSerializer, ListingSerializer, ReviewSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time DRF's field-by-field representation against the precompiled read "
+        'path for listings, bookings and reviews, per 1,000 objects. The '
+        'generated rows are rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--objects',
+            type=int,
+            default=1000,
+            help='Number of listings, bookings and reviews to generate (default: 1000)',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='Number of timed serializations per strategy (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['objects']
+        with transaction.atomic():
+            self.generate(count)
+            resources = [
+                ('listings', ListingSerializer, list(
+                    Listing.objects.select_related('host').prefetch_related(
+                        'amenities', 'reviews__guest'
+                    )
+                )),
+                ('bookings', BookingSerializer, list(
+                    Booking.objects.select_related('listing', 'guest')
+                )),
+                ('reviews', ReviewSerializer, list(Review.objects.select_related('guest'))),
+            ]
+            for name, serializer_class, objects in resources:
+                timings = {}
+                output = {}
+                for strategy, enabled in (('drf', False), ('compiled', True)):
+                    with override_settings(FAST_READ_SERIALIZERS=enabled):
+                        rounds = [
+                            self.timed(serializer_class, objects) for _ in range(options['rounds'])
+                        ]
+                        output[strategy] = JSONRenderer().render(
+                            serializer_class(objects, many=True).data
+                        )
+                    timings[strategy] = statistics.median(rounds) * 1000 * 1000 / len(objects)
+                if output['drf'] != output['compiled']:
+                    self.stderr.write(self.style.WARNING(f'{name}: representations differ'))
+                self.stdout.write(
+                    f"{name:>8}: drf {timings['drf']:.1f} ms, compiled "
+                    f"{timings['compiled']:.1f} ms per 1,000 objects "
+                    f"({timings['drf'] / timings['compiled']:.1f}x)"
+                )
+            transaction.set_rollback(True)
+
+    def generate(self, count):
+        self.stdout.write(f'Generating {count} listings, bookings and reviews...')
+        host = User.objects.create_user(username='benchmark-host', first_name='Bench')
+        guest = User.objects.create_user(username='benchmark-guest', last_name='Mark')
+        listings = Listing.objects.bulk_create([
+            Listing(
+                title=f'Listing {i}', description='Generated for benchmarking.',
+                price=Decimal('120.50'), location='Benchmark', host=host,
+                average_rating=4.5, review_count=1,
+            )
+            for i in range(count)
+        ])
+        for listing in listings[:50]:
+            listing.set_amenities(['Pool', 'WiFi'])
+        start = datetime.date(2030, 1, 1)
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                listing=listing, guest=guest,
+                check_in=start, check_out=start + datetime.timedelta(days=2),
+                total_price=Decimal('241.00'), status='completed',
+            )
+            for listing in listings
+        ])
+        Review.objects.bulk_create([
+            Review(
+                listing=booking.listing, guest=guest, booking=booking, rating=5,
+                comment='Generated review.',
+            )
+            for booking in bookings
+        ])
+
+    def timed(self, serializer_class, objects):
+        start = time.perf_counter()
+        serializer_class(objects, many=True).data
+        return time.perf_counter() - start
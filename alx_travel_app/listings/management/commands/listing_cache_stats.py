@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from alx_travel_app.listings.representations import reset_stats, shared_stats, stats
+
+
+class Command(BaseCommand):
+    help = 'Report the hit rate of the listing representation cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after reporting them',
+        )
+
+    def handle(self, *args, **options):
+        if not shared_stats():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to each process, so these counters only cover this '
+                'command. Read listing_representation_cache_* from the server\'s /metrics, '
+                'or set CACHE_URL (or LISTING_RESPONSE_CACHE) to a shared cache.'
+            ))
+        counts = stats()
+        self.stdout.write(
+            f"Hits: {counts['hits']}, misses: {counts['misses']}, "
+            f"hit rate: {counts['hit_rate']:.1%}"
+        )
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,183 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from alx_travel_app.listings import loadtest
+from alx_travel_app.listings.models import Listing
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, check=True, text=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay weighted API scenarios (browse, search, filter, detail, reviews and '
+        'booking create/confirm/cancel) with concurrent virtual users, and report '
+        'p50/p95/p99 latency, requests per second and queries per request for each '
+        'endpoint. Run it against a database seeded with `seed --bulk --seed N`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Base URL of a server using this database, e.g. http://localhost:8000 '
+                 '(default: call the app in this process)',
+        )
+        parser.add_argument(
+            '--asgi',
+            action='store_true',
+            help='Call the app in this process through its ASGI handler instead of WSGI',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Number of concurrent virtual users (default: 4)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Number of timed scenarios per virtual user (default: 50)',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Number of untimed scenarios per virtual user first (default: 5)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Seed of the scenario and parameter choices (default: 1)',
+        )
+        parser.add_argument(
+            '--mix',
+            type=loadtest.parse_mix,
+            default={name: weight for name, (_, weight) in loadtest.SCENARIOS.items()},
+            help='Scenario weights as name=weight,... (default: %s)' % ','.join(
+                f'{name}={weight}' for name, (_, weight) in loadtest.SCENARIOS.items()
+            ),
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results as JSON to this file',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Compare with the JSON results of an earlier run and fail on regressions',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=10,
+            help='Percent by which p95 latency or requests per second may worsen '
+                 'before --compare fails (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError(
+                '--concurrency and --iterations must be positive and --warmup not negative.'
+            )
+        if options['asgi'] and options['url']:
+            raise CommandError('--asgi calls the app in this process; it cannot be used with --url.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+
+        if options['url']:
+            target = loadtest.HttpTarget(options['url'])
+        elif options['asgi']:
+            target = loadtest.AsgiTarget()
+        else:
+            target = loadtest.InProcessTarget()
+        if settings.DEBUG and not options['url']:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG is on: timings include Django logging every query.'
+            ))
+        fixture = loadtest.prepare(options['concurrency'])
+        if fixture is None:
+            raise CommandError('There are no listings; seed the database first.')
+        try:
+            self.stdout.write(
+                f"Running {options['concurrency']} virtual users x {options['iterations']} "
+                f'scenarios against {target.name}...'
+            )
+            samples, elapsed = loadtest.run(
+                target, fixture, options['mix'], options['concurrency'],
+                options['iterations'], options['warmup'], options['seed'],
+            )
+        finally:
+            loadtest.teardown()
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'finished_at': timezone.now().isoformat(),
+                'target': target.name,
+                'database': connection.vendor,
+                'listings': Listing.objects.count(),
+                'concurrency': options['concurrency'],
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+                'mix': options['mix'],
+                'seconds': round(elapsed, 3),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            **loadtest.summarize(samples, elapsed),
+        }
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+        if baseline is not None:
+            self.report_comparison(baseline, results, options['tolerance'])
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<26}{'requests':>9}{'errors':>7}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>8}"
+        )
+        rows = [*results['endpoints'].items(), ('total', results['total'])]
+        for name, stats in rows:
+            queries = stats['queries_per_request']
+            self.stdout.write(
+                f"{name:<26}{stats['requests']:>9}{stats['errors']:>7}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{'-' if queries is None else f'{queries:.1f}':>8}"
+            )
+        if results['total']['errors']:
+            self.stderr.write(self.style.WARNING(
+                f"{results['total']['errors']} requests had an unexpected status."
+            ))
+
+    def report_comparison(self, baseline, results, tolerance):
+        regressions = 0
+        self.stdout.write(f"Compared with {baseline['meta'].get('commit') or 'the baseline'}:")
+        for name, metric, before, after, regressed in loadtest.compare(
+            baseline, results, tolerance
+        ):
+            regressions += regressed
+            line = f'{name:<26}{metric:<20}{before:>10} -> {after:<10}'
+            self.stdout.write(self.style.ERROR(f'{line} regressed') if regressed else line)
+        if regressions:
+            raise CommandError(f'{regressions} metrics regressed beyond {tolerance}%.')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from alx_travel_app.listings.changes import latest_cursor
+from alx_travel_app.listings.models import Change
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete change feed entries older than --days. Clients whose cursor '
+        'is older get 410 Gone and must download everything again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Number of days of changes to keep (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # The latest change is always kept so that expired cursors can be told apart.
+        deleted, _ = Change.objects.filter(created_at__lt=cutoff).exclude(
+            pk=latest_cursor()
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} changes.'))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from alx_travel_app.listings.availability import active_bookings, stay_nights
+from alx_travel_app.listings.caching import invalidate
+from alx_travel_app.listings.models import ListingNight
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-night availability calendar from active bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listing',
+            type=int,
+            action='append',
+            help='Only rebuild the calendar of this listing id (repeatable)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of nights written per insert (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        bookings = active_bookings()
+        nights = ListingNight.objects.all()
+        if options['listing']:
+            bookings = bookings.filter(listing_id__in=options['listing'])
+            nights = nights.filter(listing_id__in=options['listing'])
+
+        self.stdout.write('Rebuilding availability calendar...')
+        batch_size = options['batch_size']
+        created = 0
+        with transaction.atomic():
+            nights.delete()
+            batch = []
+            stays = bookings.order_by().values_list('pk', 'listing_id', 'check_in', 'check_out')
+            for stay in stays.iterator(chunk_size=batch_size):
+                batch.extend(stay_nights(*stay))
+                if len(batch) >= batch_size:
+                    created += self.write(batch)
+                    batch = []
+            created += self.write(batch)
+            invalidate('listings')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {created} booked nights.'))
+
+    def write(self, nights):
+        # Overlapping legacy bookings would violate the unique night
+        # constraint; the first booking of a night wins.
+        ListingNight.objects.bulk_create(nights, ignore_conflicts=True)
+        return len(nights)
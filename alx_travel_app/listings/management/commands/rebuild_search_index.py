@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from alx_travel_app.listings.caching import invalidate
+from alx_travel_app.listings.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the listing full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        self.stdout.write(f'Rebuilding search index with {type(backend).__name__}...')
+        with transaction.atomic():
+            indexed = backend.rebuild()
+            invalidate('listings')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} listings.'))
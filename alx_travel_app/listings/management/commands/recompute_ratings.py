@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from alx_travel_app.listings.models import Listing
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating columns on listings from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report listings whose rating columns are out of date',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = Listing.objects.rating_mismatches()
+
+        if options['verify']:
+            stale = list(mismatches.values_list('pk', flat=True)[:20])
+            count = mismatches.count()
+            if count:
+                raise CommandError(
+                    f'{count} listings have stale rating columns (e.g. ids {stale}).'
+                )
+            self.stdout.write(self.style.SUCCESS('All listing rating columns are up to date.'))
+            return
+
+        self.stdout.write('Recomputing listing ratings...')
+        updated = Listing.objects.recompute_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {updated} listings.'))
@@ -1,10 +1,234 @@
-from django.core.management.base import BaseCommand
+import csv
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
 from django.utils import timezone
-from datetime import datetime, timedelta
-import random
-from decimal import Decimal
-from listings.models import Listing, Booking, Review
+from django.utils.text import slugify
+from alx_travel_app.listings.availability import calendar_enabled, stay_nights
+from alx_travel_app.listings.bulk import (
+    bookings_written, insert_rows, listings_written, overlaps,
+)
+from alx_travel_app.listings.models import (
+    Amenity, Booking, Listing, ListingAmenity, ListingNight, Review, parse_amenities,
+)
+from alx_travel_app.listings.synthetic import (
+    AMENITIES, COMMENTS, MODELS, SPECIAL_REQUESTS, STATUS_WEIGHTS, STATUSES, generate,
+    random_listing_fields, random_user_fields,
+)
+
+
+class DatasetWriter:
+    """Store generated rows, mapping the indexes of related rows to primary keys.
+
+    Subclasses implement ``save()`` and may hook into each model's batches.
+    """
+
+    def __init__(self, password, reviews):
+        self.password = password
+        self.review_count = reviews
+        self.user_ids, self.listings, self.reviewed = [], [], []
+
+    def batch(self):
+        return nullcontext()
+
+    def write(self, model, rows):
+        with self.batch():
+            getattr(self, f'write_{model}')(rows)
+
+    def close(self):
+        pass
+
+    def write_users(self, rows):
+        users = [User(password=self.password, **row) for row in rows]
+        self.save(User, users)
+        self.user_ids.extend(user.pk for user in users)
+
+    def write_listings(self, rows):
+        listings, amenities = [], []
+        for row in rows:
+            amenities.append(parse_amenities(row.pop('amenities')))
+            listings.append(Listing(host_id=self.user_ids[row.pop('host')], **row))
+        self.save(Listing, listings)
+        self.save_amenities({
+            listing.pk: names for listing, names in zip(listings, amenities)
+        })
+        self.listings_saved(listings)
+        self.listings.extend((listing.pk, listing.price, listing.host_id) for listing in listings)
+
+    def write_bookings(self, rows):
+        bookings = []
+        for row in rows:
+            listing_id, price, host_id = self.listings[row.pop('listing')]
+            booking = Booking(
+                # The host is read when logging the change; no query is needed.
+                listing=Listing(pk=listing_id, host_id=host_id),
+                guest_id=self.user_ids[row.pop('guest')],
+                **row,
+            )
+            booking.total_price = price * (booking.check_out - booking.check_in).days
+            bookings.append(booking)
+        self.save(Booking, bookings)
+        self.bookings_saved(bookings, [
+            night for booking in bookings if booking.status != 'cancelled'
+            for night in stay_nights(
+                booking.pk, booking.listing_id, booking.check_in, booking.check_out
+            )
+        ])
+        # The first bookings are the completed ones that get reviewed.
+        self.reviewed.extend(
+            (booking.pk, booking.listing_id, booking.guest_id)
+            for booking in bookings[:self.review_count - len(self.reviewed)]
+        )
+
+    def write_reviews(self, rows):
+        reviews = []
+        for row in rows:
+            booking_id, listing_id, guest_id = self.reviewed[row.pop('booking')]
+            reviews.append(Review(
+                booking_id=booking_id, listing_id=listing_id, guest_id=guest_id, **row
+            ))
+        self.save(Review, reviews)
+
+    def save(self, model, objects):
+        raise NotImplementedError
+
+    def save_amenities(self, names_by_listing):
+        raise NotImplementedError
+
+    def listings_saved(self, listings):
+        pass
+
+    def bookings_saved(self, bookings, nights):
+        pass
+
+
+class DatabaseWriter(DatasetWriter):
+    """Insert each batch with ``bulk_create`` in its own transaction.
+
+    Search index, calendar and change feed rows are written as the
+    signals and views would. On backends that do not return the ids of
+    bulk inserts, such as MySQL, they are read back, so nothing else may
+    write to the seeded tables meanwhile.
+    """
+
+    def batch(self):
+        return transaction.atomic()
+
+    def save(self, model, objects):
+        insert_rows(objects)
+
+    def save_amenities(self, names_by_listing):
+        Listing.replace_amenities(names_by_listing)
+
+    def listings_saved(self, listings):
+        listings_written(listings)
+
+    def bookings_saved(self, bookings, nights):
+        bookings_written(bookings, nights)
+
+
+class FileWriter(DatasetWriter):
+    """Write a ``seed.jsonl`` fixture for ``loaddata``, or one CSV file per table.
+
+    Primary keys count from 1 and timestamps are the dataset's start date,
+    so a seed always produces the same files. Load them into an empty
+    database. Each table is written to a temporary file first, and the
+    fixture joins them with related tables before the rows referring to
+    them, as ``loaddata`` saves rows in file order.
+    """
+
+    def __init__(self, path, output_format, timestamp, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.format = output_format
+        self.timestamp = timestamp
+        self.next_pk = {}
+        self.amenity_ids = {}
+        self.files = {}
+        self.serializer = serializers.get_serializer('jsonl')()
+        os.makedirs(path, exist_ok=True)
+
+    def close(self):
+        if self.format == 'jsonl':
+            with open(os.path.join(self.path, 'seed.jsonl'), 'w', encoding='utf-8') as fixture:
+                for file, _ in self.files.values():
+                    file.seek(0)
+                    shutil.copyfileobj(file, fixture)
+        for file, _ in self.files.values():
+            file.close()
+
+    def output(self, model):
+        """Return the open file of ``model`` and its CSV writer, opening them once."""
+        if model not in self.files:
+            writer = None
+            if self.format == 'jsonl':
+                file = tempfile.TemporaryFile('w+', encoding='utf-8')
+            else:
+                path = os.path.join(self.path, f'{model._meta.db_table}.csv')
+                file = open(path, 'w', encoding='utf-8', newline='')
+                writer = csv.writer(file)
+                writer.writerow([field.column for field in model._meta.concrete_fields])
+            self.files[model] = (file, writer)
+        return self.files[model]
+
+    def save(self, model, objects):
+        fields = model._meta.concrete_fields
+        timestamps = [
+            field.attname for field in fields
+            if isinstance(field, models.DateTimeField)
+            and (field.auto_now or field.auto_now_add or field.has_default())
+        ]
+        pk = self.next_pk.get(model, 1)
+        for obj in objects:
+            obj.pk = pk
+            pk += 1
+            for name in timestamps:
+                setattr(obj, name, self.timestamp)
+        self.next_pk[model] = pk
+
+        file, writer = self.output(model)
+        if writer is None:
+            # Naming the fields skips many-to-many fields, which would be queried.
+            self.serializer.serialize(objects, stream=file, fields=[
+                field.name for field in fields if not field.primary_key
+            ])
+            return
+        for obj in objects:
+            writer.writerow([
+                '' if field.value_from_object(obj) is None else field.value_to_string(obj)
+                for field in fields
+            ])
+
+    def save_amenities(self, names_by_listing):
+        amenities = {}
+        for names in names_by_listing.values():
+            for name in names:
+                slug = slugify(name)
+                if slug not in self.amenity_ids:
+                    amenities.setdefault(slug, Amenity(slug=slug, name=name))
+        if amenities:
+            self.save(Amenity, list(amenities.values()))
+            self.amenity_ids.update((slug, amenity.pk) for slug, amenity in amenities.items())
+        self.save(ListingAmenity, [
+            ListingAmenity(listing_id=listing_id, amenity_id=self.amenity_ids[slugify(name)])
+            for listing_id, names in names_by_listing.items() for name in names
+        ])
+
+    def bookings_saved(self, bookings, nights):
+        if nights and calendar_enabled():
+            self.save(ListingNight, nights)
 
 
 class Command(BaseCommand):
@@ -28,8 +252,59 @@ class Command(BaseCommand):
             default=20,
             help='Number of listings to create (default: 20)',
         )
+        parser.add_argument(
+            '--bookings',
+            type=int,
+            help='Number of bookings to create (default: 15 to 30)',
+        )
+        parser.add_argument(
+            '--reviews',
+            type=int,
+            help='Number of reviews to create (default: half of the completed bookings)',
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Insert rows with bulk_create in batches, for large load-test databases',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows per insert with --bulk (default: 5000)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed; the same seed and counts give the same data (default: random)',
+        )
+        parser.add_argument(
+            '--start-date',
+            type=date.fromisoformat,
+            help='First booking date with --bulk, as YYYY-MM-DD (default: a year ago)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes generating rows with --bulk (default: 1)',
+        )
+        parser.add_argument(
+            '--output',
+            help='With --bulk, write the rows to files in this directory instead of the database',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'csv'],
+            default='jsonl',
+            help='--output format: a loaddata fixture or one CSV file per table (default: jsonl)',
+        )
 
     def handle(self, *args, **options):
+        if not options['bulk'] and (
+            options['output'] or options['workers'] != 1 or options['start_date']
+        ):
+            raise CommandError('--output, --workers and --start-date require --bulk.')
         if options['clear']:
             self.stdout.write('Clearing existing data...')
             Review.objects.all().delete()
@@ -38,6 +313,12 @@ class Command(BaseCommand):
             User.objects.filter(is_superuser=False).delete()
             self.stdout.write(self.style.SUCCESS('Existing data cleared.'))
 
+        if options['bulk']:
+            self.handle_bulk(options)
+            return
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+
         # Create users
         self.stdout.write('Creating users...')
         users = self.create_users(options['users'])
@@ -50,13 +331,14 @@ class Command(BaseCommand):
 
         # Create bookings
         self.stdout.write('Creating bookings...')
-        bookings = self.create_bookings(listings, users)
+        bookings = self.create_bookings(listings, users, options['bookings'])
         self.stdout.write(self.style.SUCCESS(f'Created {len(bookings)} bookings.'))
 
         # Create reviews
         self.stdout.write('Creating reviews...')
-        reviews = self.create_reviews(bookings)
+        reviews = self.create_reviews(bookings, options['reviews'])
         self.stdout.write(self.style.SUCCESS(f'Created {len(reviews)} reviews.'))
+        Listing.objects.recompute_ratings()
 
         self.stdout.write(
             self.style.SUCCESS('Database seeding completed successfully!')
@@ -65,29 +347,8 @@ class Command(BaseCommand):
     def create_users(self, count):
         """Create sample users."""
         users = []
-        first_names = [
-            'John', 'Jane', 'Mike', 'Sarah', 'David', 'Lisa', 'Chris', 'Emma',
-            'Alex', 'Maria', 'Tom', 'Anna', 'James', 'Sophie', 'Robert', 'Lucy'
-        ]
-        last_names = [
-            'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
-            'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez',
-            'Wilson', 'Anderson', 'Thomas'
-        ]
-
         for i in range(count):
-            first_name = random.choice(first_names)
-            last_name = random.choice(last_names)
-            username = f"{first_name.lower()}{last_name.lower()}{i}"
-            email = f"{username}@example.com"
-            
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                first_name=first_name,
-                last_name=last_name,
-                password='password123'
-            )
+            user = User.objects.create_user(password='password123', **random_user_fields(i))
             users.append(user)
 
         return users
@@ -95,80 +356,23 @@ class Command(BaseCommand):
     def create_listings(self, count, users):
         """Create sample listings."""
         listings = []
-        property_types = ['apartment', 'house', 'condo', 'villa', 'studio']
-        
-        locations = [
-            'New York, NY', 'Los Angeles, CA', 'Chicago, IL', 'Houston, TX',
-            'Phoenix, AZ', 'Philadelphia, PA', 'San Antonio, TX', 'San Diego, CA',
-            'Dallas, TX', 'San Jose, CA', 'Austin, TX', 'Jacksonville, FL',
-            'Fort Worth, TX', 'Columbus, OH', 'Charlotte, NC', 'San Francisco, CA',
-            'Indianapolis, IN', 'Seattle, WA', 'Denver, CO', 'Washington, DC'
-        ]
-
-        titles = [
-            'Cozy Apartment in Downtown', 'Beautiful House with Garden',
-            'Modern Condo with City View', 'Luxury Villa by the Beach',
-            'Charming Studio in Historic District', 'Spacious Family Home',
-            'Elegant Apartment with Balcony', 'Rustic Cabin in the Woods',
-            'Contemporary Loft', 'Traditional House with Pool',
-            'Penthouse with Panoramic Views', 'Cottage by the Lake',
-            'Urban Apartment Near Metro', 'Mountain Retreat',
-            'Beachfront Condo', 'Historic Brownstone',
-            'Modern Townhouse', 'Garden Apartment',
-            'Luxury Penthouse', 'Cozy Bungalow'
-        ]
-
-        descriptions = [
-            'A beautiful and comfortable space perfect for your stay.',
-            'Modern amenities and stunning views await you here.',
-            'Experience luxury and comfort in this amazing property.',
-            'Perfect location with easy access to all attractions.',
-            'A home away from home with all the comforts you need.',
-            'Stunning architecture and thoughtful design throughout.',
-            'Prime location with excellent transportation links.',
-            'Peaceful retreat in the heart of the city.',
-            'Spacious and well-appointed for your perfect getaway.',
-            'Charming property with character and modern conveniences.'
-        ]
-
-        amenities_list = [
-            'WiFi, Air Conditioning, Kitchen, Parking',
-            'WiFi, Pool, Gym, Balcony',
-            'WiFi, Hot Tub, Fireplace, Garden',
-            'WiFi, Air Conditioning, Kitchen, Washer',
-            'WiFi, Pool, Gym, Balcony, Parking',
-            'WiFi, Hot Tub, Fireplace, Garden, Pool',
-            'WiFi, Air Conditioning, Kitchen, Balcony',
-            'WiFi, Pool, Gym, Parking, Washer',
-            'WiFi, Hot Tub, Fireplace, Garden, Pool, Gym',
-            'WiFi, Air Conditioning, Kitchen, Balcony, Parking'
-        ]
-
         for i in range(count):
-            listing = Listing.objects.create(
-                title=random.choice(titles),
-                description=random.choice(descriptions),
-                price=Decimal(random.uniform(50, 500)).quantize(Decimal('0.01')),
-                location=random.choice(locations),
-                property_type=random.choice(property_types),
-                bedrooms=random.randint(1, 5),
-                bathrooms=random.randint(1, 3),
-                max_guests=random.randint(1, 8),
-                amenities=random.choice(amenities_list),
-                is_available=random.choice([True, True, True, False]),  # 75% available
-                host=random.choice(users)
-            )
+            listing = Listing.objects.create(host=random.choice(users), **random_listing_fields())
+            listing.set_amenities(parse_amenities(random.choice(AMENITIES)))
             listings.append(listing)
 
         return listings
 
-    def create_bookings(self, listings, users):
+    def create_bookings(self, listings, users, count=None):
         """Create sample bookings."""
         bookings = []
-        statuses = ['pending', 'confirmed', 'completed', 'cancelled']
-        status_weights = [0.1, 0.6, 0.25, 0.05]  # Weighted distribution
+        if count is None:
+            count = random.randint(15, 30)  # Random number of bookings
 
-        for _ in range(random.randint(15, 30)):  # Random number of bookings
+        # Active bookings may not share nights, so a random stay overlapping
+        # one is created cancelled instead.
+        stays = {}
+        for _ in range(count):
             listing = random.choice(listings)
             guest = random.choice(users)
             
@@ -179,12 +383,13 @@ class Command(BaseCommand):
             # Calculate total price
             nights = (end_date - start_date).days
             total_price = listing.price * nights
-            
-            special_requests = random.choice([
-                '', 'Late check-in requested', 'Early check-in if possible',
-                'Quiet hours please', 'Extra towels needed', '',
-                'Pet-friendly accommodation', 'Wheelchair accessible needed', ''
-            ])
+            status = random.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+            special_requests = random.choice(SPECIAL_REQUESTS)
+            listing_stays = stays.setdefault(listing.pk, [])
+            if status != 'cancelled' and overlaps(listing_stays, start_date, end_date):
+                status = 'cancelled'
+            if status != 'cancelled':
+                listing_stays.append((start_date, end_date))
 
             booking = Booking.objects.create(
                 listing=listing,
@@ -192,50 +397,113 @@ class Command(BaseCommand):
                 check_in=start_date,
                 check_out=end_date,
                 total_price=total_price,
-                status=random.choices(statuses, weights=status_weights)[0],
-                special_requests=special_requests
+                status=status,
+                special_requests=special_requests,
             )
             bookings.append(booking)
 
         return bookings
 
-    def create_reviews(self, bookings):
+    def create_reviews(self, bookings, count=None):
         """Create sample reviews."""
         reviews = []
-        comments = [
-            'Excellent stay! Highly recommended.',
-            'Great location and very clean.',
-            'Perfect for our family vacation.',
-            'Beautiful property with amazing views.',
-            'Host was very responsive and helpful.',
-            'Would definitely stay here again.',
-            'Clean, comfortable, and well-equipped.',
-            'Great value for money.',
-            'Lovely place with character.',
-            'Perfect location for exploring the city.',
-            'Amazing amenities and great service.',
-            'Very comfortable and spacious.',
-            'Host went above and beyond.',
-            'Beautiful property, highly recommend.',
-            'Great experience overall.',
-            'Clean, modern, and well-maintained.',
-            'Perfect for a weekend getaway.',
-            'Excellent communication from host.',
-            'Lovely place with great atmosphere.',
-            'Would book again in a heartbeat.'
-        ]
 
         # Only create reviews for completed bookings
         completed_bookings = [b for b in bookings if b.status == 'completed']
-        
-        for booking in completed_bookings[:len(completed_bookings)//2]:  # Review half of completed bookings
+        if count is None:
+            count = len(completed_bookings) // 2  # Review half of completed bookings
+
+        for booking in completed_bookings[:count]:
             review = Review.objects.create(
                 listing=booking.listing,
                 guest=booking.guest,
                 booking=booking,
                 rating=random.randint(3, 5),  # Mostly positive reviews
-                comment=random.choice(comments)
+                comment=random.choice(COMMENTS)
             )
             reviews.append(review)
 
         return reviews
+
+    def handle_bulk(self, options):
+        """Generate a reproducible dataset and write it in batches.
+
+        Partitions are generated in ``--workers`` processes while this one
+        writes them, ``--batch-size`` rows at a time, to the database or to
+        ``--output``.
+        """
+        dataset = self.dataset(options)
+        seed, start_date = dataset['seed'], dataset['start_date']
+        self.stdout.write(
+            f'Dataset seed {seed}, starting {start_date}. Pass '
+            f'--seed {seed} --start-date {start_date} to generate it again.'
+        )
+        writer_options = {
+            'password': make_password('password123', salt=f'seed{seed}'),
+            'reviews': dataset['reviews'],
+        }
+        if options['output']:
+            timestamp = datetime.combine(start_date, datetime.min.time(), tzinfo=dt_timezone.utc)
+            writer = FileWriter(options['output'], options['format'], timestamp, **writer_options)
+        else:
+            writer = DatabaseWriter(**writer_options)
+
+        workers = options['workers']
+        started = time.perf_counter()
+        with multiprocessing.Pool(workers) if workers > 1 else nullcontext() as pool:
+            for model in MODELS:
+                self.timed(
+                    model, dataset[model], self.write_rows,
+                    writer, model, dataset, pool, workers, options['batch_size'],
+                )
+        writer.close()
+
+        total = sum(dataset[model] for model in MODELS)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s).'
+        ))
+        if options['output']:
+            self.stdout.write(
+                f"Wrote {options['output']}. After loading it, run recompute_ratings "
+                'and rebuild_search_index.'
+            )
+        else:
+            Listing.objects.recompute_ratings()
+
+    def dataset(self, options):
+        """Return the seed, start date and row counts of a ``--bulk`` run."""
+        listings = options['listings']
+        bookings = options['bookings'] if options['bookings'] is not None else listings * 2
+        reviews = options['reviews'] if options['reviews'] is not None else bookings // 4
+        if min(options['users'], listings) < 1 and bookings:
+            raise CommandError('Bookings need at least one user and one listing.')
+        if reviews > bookings:
+            raise CommandError('--reviews cannot exceed --bookings.')
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive.')
+        return {
+            'seed': options['seed'] if options['seed'] is not None else random.randrange(2 ** 32),
+            'start_date': options['start_date'] or timezone.now().date() - timedelta(days=365),
+            'users': options['users'],
+            'listings': listings,
+            'bookings': bookings,
+            'reviews': reviews,
+        }
+
+    def timed(self, name, count, create, *args):
+        """Run ``create(*args)``, which writes ``count`` rows, and report its rows per second."""
+        self.stdout.write(f'Creating {count} {name}...')
+        start = time.perf_counter()
+        result = create(*args)
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {count} {name} in {elapsed:.1f}s ({rate:.0f} rows/s).'
+        ))
+        return result
+
+    def write_rows(self, writer, model, dataset, pool, workers, batch_size):
+        rows = generate(model, dataset, pool, ahead=2 * workers)
+        while batch := list(islice(rows, batch_size)):
+            writer.write(model, batch)
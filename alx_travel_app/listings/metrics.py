@@ -0,0 +1,304 @@
+"""Per-request performance metrics.
+
+``PerformanceMiddleware`` times every request while a database
+``execute_wrapper`` counts and times its SQL queries. Each request's time
+is split into:
+
+- ``db``: SQL queries, on every database connection;
+- ``serialize``: top-level serializer ``to_representation`` calls, less
+  the SQL they run (see ``timed_serialization``);
+- ``render``: rendering DRF responses to JSON;
+- ``app``: everything else.
+
+Every response gets a ``Server-Timing`` header with these parts, which
+browser developer tools display. A JSON line per request goes to the
+``alx_travel_app.performance`` logger: at INFO level, or at WARNING level
+when the request took at least ``PERFORMANCE_SLOW_REQUEST_MS``.
+
+Measurements are also added to per-route histograms, labelled with the
+URL name and method. ``metrics_view`` serves them in the Prometheus text
+format to staff users and to clients sending ``METRICS_TOKEN``. The histograms are kept in process memory, so each server
+process reports its own. Streaming responses are timed until their
+first byte, and their size is not recorded.
+
+Repeated (N+1) and slow SQL statements are logged too; see ``querycheck``.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import representations
+from .querycheck import QueryInspector
+
+logger = logging.getLogger('alx_travel_app.performance')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Request wall time.', SECONDS_BUCKETS),
+    'http_request_db_seconds': ('Time spent in SQL queries.', SECONDS_BUCKETS),
+    'http_request_db_queries': ('SQL queries per request.', QUERY_BUCKETS),
+    'http_request_serialize_seconds': (
+        'Time spent serializing, excluding SQL.', SECONDS_BUCKETS
+    ),
+    'http_request_render_seconds': ('Time spent rendering responses.', SECONDS_BUCKETS),
+    'http_response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+}
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def metrics_enabled():
+    return getattr(settings, 'PERFORMANCE_METRICS', True)
+
+
+class RequestMetrics:
+    """Measurements of one request, in seconds; also the SQL ``execute_wrapper``."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def rendered(self, response):
+        self.render += time.perf_counter() - self.render_started
+
+    def parts(self, total):
+        """Return ``(name, seconds)`` of each part of ``total``."""
+        app = max(0.0, total - self.db - self.serialize - self.render)
+        return [
+            ('db', self.db), ('serialize', self.serialize), ('render', self.render),
+            ('app', app), ('total', total),
+        ]
+
+
+def timed_serialization(to_representation):
+    """Add the time of top-level ``to_representation`` calls to the request's metrics.
+
+    Nested calls are part of the outermost one, and SQL run while
+    serializing is counted as ``db`` time only.
+    """
+    @functools.wraps(to_representation)
+    def wrapper(serializer, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return to_representation(serializer, instance)
+        metrics.serializing = True
+        start, db = time.perf_counter(), metrics.db
+        try:
+            return to_representation(serializer, instance)
+        finally:
+            metrics.serialize += time.perf_counter() - start - (metrics.db - db)
+            metrics.serializing = False
+    return wrapper
+
+
+class Histogram:
+    """Prometheus histogram: observation counts per upper bound, plus their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """Yield the ``le`` label and cumulative count of each bucket."""
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+def label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def labels(**values):
+    return ','.join(f'{name}="{label_value(value)}"' for name, value in values.items())
+
+
+class Registry:
+    """Request counts and histograms per route and method."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.histograms = {name: {} for name in HISTOGRAMS}
+
+    def observe(self, route, method, status, values):
+        """Count a request and add its ``{histogram name: value}`` measurements."""
+        with self.lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in values.items():
+                histograms = self.histograms[name]
+                histogram = histograms.get((route, method))
+                if histogram is None:
+                    histogram = histograms[(route, method)] = Histogram(HISTOGRAMS[name][1])
+                histogram.observe(value)
+
+    def exposition(self):
+        """Return the metrics in the Prometheus text format."""
+        lines = [
+            '# HELP http_requests_total Requests handled.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self.lock:
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{{labels(route=route, method=method, status=status)}}} '
+                    f'{count}'
+                )
+            for name, (description, _) in HISTOGRAMS.items():
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (route, method), histogram in sorted(self.histograms[name].items()):
+                    route_labels = labels(route=route, method=method)
+                    lines += [
+                        f'{name}_bucket{{{route_labels},le="{bound}"}} {count}'
+                        for bound, count in histogram.samples()
+                    ]
+                    lines += [
+                        f'{name}_sum{{{route_labels}}} {histogram.sum:.6f}',
+                        f'{name}_count{{{route_labels}}} {sum(histogram.counts)}',
+                    ]
+        cache = representations.stats()
+        for name in ('hits', 'misses'):
+            metric = f'listing_representation_cache_{name}_total'
+            lines += [
+                f'# HELP {metric} Listing representation cache {name}.',
+                f'# TYPE {metric} counter',
+                f'{metric} {cache[name]}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route) if match else 'unmatched'
+
+
+class PerformanceMiddleware:
+    """Measure each request; see the module docstring.
+
+    Put it first in ``MIDDLEWARE`` so that it times the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        inspector = QueryInspector()
+        wrappers = [metrics]
+        if inspector.repeat_threshold or inspector.slow_ms:
+            wrappers.append(inspector)
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    for wrapper in wrappers:
+                        stack.enter_context(connection.execute_wrapper(wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.report(request, response, metrics)
+        inspector.report(request.method, request.path, route_of(request))
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(metrics.rendered)
+        return response
+
+    def report(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        parts = metrics.parts(total)
+        timing = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in parts]
+        timing[0] += f';desc="{metrics.queries} queries"'
+        if response.has_header('Server-Timing'):
+            timing.insert(0, response['Server-Timing'])
+        response['Server-Timing'] = ', '.join(timing)
+
+        size = None if response.streaming else len(response.content)
+        route = route_of(request)
+        values = {
+            'http_request_duration_seconds': total,
+            'http_request_db_seconds': metrics.db,
+            'http_request_db_queries': metrics.queries,
+            'http_request_serialize_seconds': metrics.serialize,
+            'http_request_render_seconds': metrics.render,
+        }
+        if size is not None:
+            values['http_response_size_bytes'] = size
+        registry.observe(route, request.method, response.status_code, values)
+
+        slow = total * 1000 >= getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 500)
+        level = logging.WARNING if slow else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'route': route,
+                'status': response.status_code,
+                'queries': metrics.queries,
+                **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in parts},
+                'bytes': size,
+            }))
+
+
+def metrics_view(request):
+    """Serve the metrics of this process to staff users or with ``METRICS_TOKEN``.
+
+    Without a token configured, other clients get a 404, as if there were no
+    endpoint.
+    """
+    user = getattr(request, 'user', None)
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not (user is not None and user.is_active and user.is_staff):
+        if not token:
+            raise Http404
+        if not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'
+        ):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(registry.exposition(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['max_guests'], name='listing_max_guests_idx'),
+        ),
+    ]
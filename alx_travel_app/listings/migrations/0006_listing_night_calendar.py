@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:40
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+import django.db.models.deletion
+from datetime import timedelta
+from itertools import islice
+import logging
+
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_nights(apps, schema_editor):
+    Booking = apps.get_model('listings', 'Booking')
+    ListingNight = apps.get_model('listings', 'ListingNight')
+    active = Booking.objects.exclude(status='cancelled')
+    # Active bookings sharing a night with an earlier one cannot have calendar
+    # rows; they are reported so that they can be fixed by hand.
+    overlapping = Exists(active.filter(
+        listing_id=OuterRef('listing_id'), pk__lt=OuterRef('pk'),
+        check_in__lt=OuterRef('check_out'), check_out__gt=OuterRef('check_in'),
+    ))
+    conflicts = list(active.filter(overlapping).order_by('pk').values_list('pk', flat=True))
+    if conflicts:
+        logger.warning(
+            'Skipped the nights of active bookings overlapping earlier ones (ids %s). '
+            'Cancel or move them, then run rebuild_calendar.',
+            ', '.join(map(str, conflicts)),
+        )
+
+    stays = active.filter(~overlapping).order_by().values_list(
+        'pk', 'listing_id', 'check_in', 'check_out'
+    )
+    nights = (
+        ListingNight(listing_id=listing_id, booking_id=pk, date=check_in + timedelta(days=i))
+        for pk, listing_id, check_in, check_out in stays.iterator(chunk_size=BATCH_SIZE)
+        for i in range((check_out - check_in).days)
+    )
+    while batch := list(islice(nights, BATCH_SIZE)):
+        ListingNight.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_listing_max_guests_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='listings.booking')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_nights', to='listings.listing')),
+            ],
+            options={
+                'ordering': ['listing', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingnight',
+            constraint=models.UniqueConstraint(fields=('listing', 'date'), name='listing_night_unique'),
+        ),
+        migrations.RunPython(backfill_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FTS_TABLE = 'listings_listing_fts'
+SEARCH_COLUMNS = 'title, description, location, amenities'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"{SEARCH_COLUMNS}, tokenize='porter unicode61')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {SEARCH_COLUMNS}) "
+        f"SELECT id, {SEARCH_COLUMNS} FROM listings_listing"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_listing_night_calendar'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-17 06:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def split_amenities(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    Amenity = apps.get_model('listings', 'Amenity')
+    ListingAmenity = apps.get_model('listings', 'ListingAmenity')
+    listing_slugs = {}
+    names = {}
+    for pk, text in Listing.objects.order_by('pk').values_list('pk', 'amenities_text').iterator():
+        slugs = listing_slugs.setdefault(pk, set())
+        for name in (text or '').split(','):
+            name = name.strip()
+            slug = slugify(name)
+            if slug:
+                names.setdefault(slug, name)
+                slugs.add(slug)
+    Amenity.objects.bulk_create(
+        [Amenity(slug=slug, name=name) for slug, name in names.items()], batch_size=1000
+    )
+    amenity_ids = dict(Amenity.objects.values_list('slug', 'pk'))
+    ListingAmenity.objects.bulk_create(
+        [
+            ListingAmenity(listing_id=pk, amenity_id=amenity_ids[slug])
+            for pk, slugs in listing_slugs.items()
+            for slug in slugs
+        ],
+        batch_size=1000,
+    )
+
+
+def join_amenities(apps, schema_editor):
+    Listing = apps.get_model('listings', 'Listing')
+    ListingAmenity = apps.get_model('listings', 'ListingAmenity')
+    texts = {}
+    for pk, name in ListingAmenity.objects.order_by('amenity__name').values_list(
+        'listing_id', 'amenity__name'
+    ).iterator():
+        texts.setdefault(pk, []).append(name)
+    for pk, names in texts.items():
+        Listing.objects.filter(pk=pk).update(amenities_text=', '.join(names))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0007_listing_search_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='listing',
+            old_name='amenities',
+            new_name='amenities_text',
+        ),
+        migrations.CreateModel(
+            name='Amenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'amenities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ListingAmenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amenity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listing_links', to='listings.amenity')),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='amenity_links', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['amenity', 'listing'], name='listing_amenity_reverse_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='listingamenity',
+            constraint=models.UniqueConstraint(fields=('listing', 'amenity'), name='listing_amenity_unique'),
+        ),
+        migrations.RunPython(split_amenities, join_amenities),
+        migrations.RemoveField(
+            model_name='listing',
+            name='amenities_text',
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='amenities',
+            field=models.ManyToManyField(blank=True, related_name='listings', through='listings.ListingAmenity', to='listings.amenity'),
+        ),
+    ]
@@ -1,6 +1,83 @@
-from django.db import models
+import hashlib
+import secrets
+
+from django.db import models, transaction
+from django.db.models import (
+    Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Cast, Coalesce, RowNumber
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import geo
+from .caching import invalidate, listing_tag
+
+
+class ListingQuerySet(models.QuerySet):
+    """Query helpers for the denormalized rating columns."""
+
+    def with_actual_ratings(self):
+        """Annotate the rating sum and review count computed from reviews."""
+        reviews = Review.objects.filter(listing=OuterRef('pk')).order_by().values('listing')
+        return self.annotate(
+            actual_rating_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0
+            ),
+            actual_review_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('pk')).values('total')), 0
+            ),
+        )
+
+    def rating_mismatches(self):
+        """Return listings whose stored rating columns disagree with their reviews."""
+        return self.with_actual_ratings().exclude(
+            rating_sum=F('actual_rating_sum'), review_count=F('actual_review_count')
+        )
+
+    def recompute_ratings(self):
+        """Recompute the rating columns from the reviews table in bulk."""
+        reviews = Review.objects.filter(listing=OuterRef('pk')).order_by().values('listing')
+        with transaction.atomic():
+            stale = list(self.rating_mismatches().values_list('pk', flat=True))
+            updated = self.update(
+                rating_sum=Coalesce(
+                    Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0
+                ),
+                review_count=Coalesce(
+                    Subquery(reviews.annotate(total=Count('pk')).values('total')), 0
+                ),
+            )
+            self.update(average_rating=average_rating_expression())
+            self.model.objects.filter(pk__in=stale).update(updated_at=timezone.now())
+            Change.objects.record('listing', stale)
+        invalidate()
+        return updated
+
+    def amenity_counts(self):
+        """Count the listings of this queryset carrying each amenity, most common first."""
+        return ListingAmenity.objects.filter(
+            listing__in=self.order_by().values('pk')
+        ).values(
+            slug=F('amenity__slug'), name=F('amenity__name')
+        ).annotate(count=Count('listing')).order_by('-count', 'name')
+
+
+def geohash_of(latitude, longitude):
+    """Return the geohash stored for a listing's coordinates, or ``''`` without them."""
+    if latitude is None or longitude is None:
+        return ''
+    return geo.encode(latitude, longitude)
+
+
+def average_rating_expression():
+    """SQL expression deriving ``average_rating`` from the stored columns."""
+    return Case(
+        When(review_count=0, then=Value(0.0)),
+        default=Cast(F('rating_sum'), FloatField()) / F('review_count'),
+        output_field=FloatField(),
+    )
 
 
 class Listing(models.Model):
@@ -21,17 +98,165 @@ class Listing(models.Model):
     bedrooms = models.PositiveIntegerField(default=1)
     bathrooms = models.PositiveIntegerField(default=1)
     max_guests = models.PositiveIntegerField(default=1)
-    amenities = models.TextField(blank=True, help_text="Comma-separated list of amenities")
+    amenities = models.ManyToManyField(
+        'Amenity', through='ListingAmenity', related_name='listings', blank=True
+    )
     is_available = models.BooleanField(default=True)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     host = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ListingQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.title} - {self.location}"
 
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_of(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def apply_review_change(cls, listing_id, rating_delta, count_delta):
+        """Adjust the denormalized rating columns of a listing in place.
+
+        ``updated_at`` is bumped too, so incremental exports pick the change up.
+        """
+        listing = cls.objects.filter(pk=listing_id)
+        # The average is derived in a second statement because MySQL applies
+        # SET assignments left to right within a single UPDATE.
+        with transaction.atomic():
+            listing.update(
+                rating_sum=F('rating_sum') + rating_delta,
+                review_count=F('review_count') + count_delta,
+                updated_at=timezone.now(),
+            )
+            listing.update(average_rating=average_rating_expression())
+        invalidate(listing_tag(listing_id), 'listings')
+
+    def set_amenities(self, names):
+        """Replace the listing's amenities, creating the ones that do not exist yet.
+
+        Unlike ``amenities.set()``, a replacement sends one ``m2m_changed``
+        round rather than a remove and an add, whose receivers would each
+        re-index and log the whole listing.
+        """
+        by_slug = {slugify(name): name for name in names if slugify(name)}
+        Amenity.objects.bulk_create(
+            [Amenity(slug=slug, name=name) for slug, name in by_slug.items()],
+            ignore_conflicts=True,
+        )
+        wanted = set(Amenity.objects.filter(slug__in=by_slug).values_list('pk', flat=True))
+        current = set(self.amenities.values_list('pk', flat=True))
+        added, removed = wanted - current, current - wanted
+        if added:
+            if removed:
+                ListingAmenity.objects.filter(listing=self, amenity_id__in=removed).delete()
+            self.amenities.add(*added)
+        elif removed:
+            self.amenities.remove(*removed)
+
+    @classmethod
+    def replace_amenities(cls, names_by_listing):
+        """Replace the amenities of many listings, given as ``{listing_id: names}``.
+
+        Unlike ``set_amenities``, this runs a fixed number of queries and
+        sends no ``m2m_changed`` signals.
+        """
+        slugs_by_listing = {
+            listing_id: {slugify(name): name for name in names if slugify(name)}
+            for listing_id, names in names_by_listing.items()
+        }
+        by_slug = {}
+        for slugs in slugs_by_listing.values():
+            for slug, name in slugs.items():
+                by_slug.setdefault(slug, name)
+        Amenity.objects.bulk_create(
+            [Amenity(slug=slug, name=name) for slug, name in by_slug.items()],
+            ignore_conflicts=True,
+        )
+        amenity_ids = dict(Amenity.objects.filter(slug__in=by_slug).values_list('slug', 'pk'))
+        ListingAmenity.objects.filter(listing_id__in=slugs_by_listing).delete()
+        ListingAmenity.objects.bulk_create([
+            ListingAmenity(listing_id=listing_id, amenity_id=amenity_ids[slug])
+            for listing_id, slugs in slugs_by_listing.items() for slug in slugs
+        ])
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='listing_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='listing_updated_id_idx'),
+            models.Index(fields=['price', 'id'], name='listing_price_id_idx'),
+            models.Index(fields=['average_rating', 'id'], name='listing_rating_id_idx'),
+            models.Index(
+                fields=['is_available', 'property_type', 'price'],
+                name='listing_avail_type_price_idx',
+            ),
+            models.Index(fields=['property_type', 'price'], name='listing_type_price_idx'),
+            models.Index(fields=['bedrooms', 'bathrooms'], name='listing_bed_bath_idx'),
+            models.Index(fields=['bathrooms'], name='listing_bathrooms_idx'),
+            models.Index(fields=['max_guests'], name='listing_max_guests_idx'),
+            models.Index(fields=['geohash'], name='listing_geohash_idx'),
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(is_available=True),
+                name='listing_available_new_idx',
+            ),
+        ]
+
+
+def parse_amenities(text):
+    """Split a comma-separated amenities string into distinct names."""
+    names = {}
+    for name in text.split(','):
+        name = name.strip()
+        slug = slugify(name)
+        if slug:
+            names.setdefault(slug, name)
+    return list(names.values())
+
+
+class Amenity(models.Model):
+    """A feature a listing can offer, such as WiFi or a pool."""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'amenities'
+
+
+class ListingAmenity(models.Model):
+    """Links a listing to one of its amenities."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='amenity_links')
+    amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE, related_name='listing_links')
+
+    def __str__(self):
+        return f"{self.listing_id} - {self.amenity_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'amenity'], name='listing_amenity_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['amenity', 'listing'], name='listing_amenity_reverse_idx'),
+        ]
 
 
 class Booking(models.Model):
@@ -56,9 +281,64 @@ class Booking(models.Model):
     def __str__(self):
         return f"{self.guest.username} - {self.listing.title} ({self.check_in} to {self.check_out})"
 
+    def save(self, *args, **kwargs):
+        # The calendar rows written by signals.py commit with the booking.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
-        unique_together = ['listing', 'check_in', 'check_out']
+        constraints = [
+            # Cancelled stays may be booked again; overlaps are refused by
+            # availability.reserve and the calendar's unique nights.
+            models.UniqueConstraint(
+                fields=['listing', 'check_in', 'check_out'],
+                condition=~Q(status='cancelled'),
+                name='booking_active_stay_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='booking_updated_id_idx'),
+            models.Index(fields=['check_in', 'id'], name='booking_check_in_id_idx'),
+            models.Index(fields=['check_out'], name='booking_check_out_idx'),
+            models.Index(fields=['status', 'check_in'], name='booking_status_check_in_idx'),
+        ]
+
+
+class ListingNight(models.Model):
+    """A night of a listing occupied by an active booking.
+
+    Rows are derived from bookings (see ``availability.sync_calendar``, run
+    whenever a booking is saved) so availability can be read without
+    scanning booking history.
+    """
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='booked_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+
+    def __str__(self):
+        return f"{self.listing_id} - {self.date}"
+
+    class Meta:
+        ordering = ['listing', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'date'], name='listing_night_unique'),
+        ]
+
+
+class ReviewQuerySet(models.QuerySet):
+    """Query helpers for reviews."""
+
+    def latest_per_listing(self, limit):
+        """Keep only the ``limit`` most recent reviews of each listing."""
+        return self.annotate(
+            listing_rank=Window(
+                RowNumber(),
+                partition_by=F('listing_id'),
+                order_by=F('created_at').desc(),
+            )
+        ).filter(listing_rank__lte=limit)
 
 
 class Review(models.Model):
@@ -74,9 +354,128 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ReviewQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.guest.username} - {self.listing.title} ({self.rating} stars)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored listing and rating, which a save moves between listings."""
+        review = super().from_db(db, field_names, values)
+        review.stored_rating = (review.__dict__.get('listing_id'), review.__dict__.get('rating'))
+        return review
+
+    def save(self, *args, **kwargs):
+        # The signals in signals.py update the listing rating columns in the
+        # same transaction.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['listing', 'guest', 'booking']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_id_idx'),
+            models.Index(fields=['rating', 'id'], name='review_rating_id_idx'),
+        ]
+
+
+def hash_token_key(key):
+    """Return the digest under which an API token key is stored."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ApiToken(models.Model):
+    """A bearer token for API clients.
+
+    Only the SHA-256 digest of the key is stored; keys are random enough
+    that a fast hash is safe, unlike passwords.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    prefix = models.CharField(max_length=8, editable=False)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.prefix}..."
+
+    @classmethod
+    def issue(cls, user, name=''):
+        """Create a token for a user and return it with its key, which is not stored."""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(
+            user=user, name=name, prefix=key[:8], key_hash=hash_token_key(key)
+        )
+        return token, key
+
+    def revoke(self):
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['revoked_at'])
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class ChangeQuerySet(models.QuerySet):
+
+    def record(self, resource, object_ids, action='upsert', guest_id=None, host_id=None):
+        """Append a change for each of ``object_ids``."""
+        return self.bulk_create([
+            Change(
+                resource=resource, object_id=object_id, action=action,
+                guest_id=guest_id, host_id=host_id,
+            )
+            for object_id in object_ids
+        ])
+
+    def record_booking(self, booking, action='upsert'):
+        return self.record_bookings([booking], action)
+
+    def record_bookings(self, bookings, action='upsert'):
+        """Append a change for each booking, reading the host from ``booking.listing``."""
+        return self.bulk_create([
+            Change(
+                resource='booking', object_id=booking.pk, action=action,
+                guest_id=booking.guest_id, host_id=booking.listing.host_id,
+            )
+            for booking in bookings
+        ])
+
+
+class Change(models.Model):
+    """An append-only log entry saying a listing or booking was written.
+
+    The id is the change feed cursor (see ``changes.py``). Booking entries
+    keep the guest and host ids so that deletions can still be shown to
+    them only.
+    """
+    RESOURCE_CHOICES = [
+        ('listing', 'Listing'),
+        ('booking', 'Booking'),
+    ]
+    ACTION_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    resource = models.CharField(max_length=10, choices=RESOURCE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='upsert')
+    guest_id = models.PositiveIntegerField(null=True, blank=True)
+    host_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ChangeQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.resource} {self.object_id}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['created_at'], name='change_created_idx'),
+        ]
@@ -0,0 +1,203 @@
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, Q, Value
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class NoCountPagination(PageNumberPagination):
+    """Page-number pagination that skips the ``COUNT(*)`` query.
+
+    One extra row is fetched to find out whether a next page exists, so the
+    response has ``next`` and ``previous`` links but no ``count``.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+
+        self.request = request
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination seeking on ``(ordering field, id)``.
+
+    The ordering field is the first field of the view's ``?ordering=`` (or
+    its default ordering) and ties are broken by primary key, so every page
+    is a bounded index range scan regardless of how deep the client scrolls.
+    The field may also be an annotation such as ``distance`` or
+    ``relevance``; when it is a constant, pages are keyed on the id alone.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.page_size:
+            return None
+
+        self.request = request
+        self.field_name, self.descending = self.get_ordering(request, queryset, view)
+        key_field = self.get_key_field(queryset)
+        cursor = self.decode_cursor(request, key_field)
+        self.forward = cursor is None or cursor['forward']
+        if cursor is not None:
+            # Rows after the cursor have a smaller key when walking forward
+            # through a descending ordering (or backward through an ascending one).
+            lookup = 'lt' if self.descending == self.forward else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}e': cursor['value']}),
+                Q(**{f'{self.field_name}__{lookup}': cursor['value']})
+                | Q(**{self.field_name: cursor['value'], f'pk__{lookup}': cursor['pk']}),
+            )
+
+        ascending = self.descending != self.forward
+        order = [self.field_name, 'pk'] if ascending else [f'-{self.field_name}', '-pk']
+        queryset = queryset.annotate(keyset_value=F(self.field_name)).order_by(*order)
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if not self.forward:
+            rows.reverse()
+
+        self.has_next = has_more if self.forward else True
+        self.has_previous = (has_more if not self.forward else True) and cursor is not None
+        self.page = rows
+        return rows
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ``(field name, descending)`` pair the page is keyed on."""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering or ['-pk']
+        field_name = ordering[0]
+        if field_name.startswith('-'):
+            return field_name[1:], True
+        return field_name, False
+
+    def get_key_field(self, queryset):
+        """Return the model field, or annotation output field, that parses cursor values."""
+        annotation = queryset.query.annotations.get(self.field_name)
+        if isinstance(annotation, Value):
+            self.field_name = 'pk'
+            return queryset.model._meta.pk
+        if annotation is not None:
+            return annotation.output_field
+        try:
+            return queryset.model._meta.get_field(self.field_name)
+        except FieldDoesNotExist:
+            raise ValidationError({'ordering': [
+                f'Cursor pagination does not support ordering by {self.field_name}.'
+            ]})
+
+    def decode_cursor(self, request, key_field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return {
+                'value': key_field.to_python(payload['v']),
+                'pk': int(payload['pk']),
+                'forward': bool(payload['f']),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error,
+                DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, forward):
+        value = row.keyset_value
+        value = value.isoformat() if isinstance(value, date) else str(value)
+        payload = json.dumps({'v': value, 'pk': row.pk, 'f': forward})
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], forward=True)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], forward=False)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class SelectablePagination(PageNumberPagination):
+    """Page-number pagination that clients can swap per request.
+
+    ``?pagination=cursor`` switches to ``KeysetPagination`` and
+    ``?pagination=nocount`` to ``NoCountPagination``; any other value keeps
+    the classic counted page numbers.
+    """
+    pagination_query_param = 'pagination'
+    modes = {
+        'cursor': KeysetPagination,
+        'nocount': NoCountPagination,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = self.modes.get(request.query_params.get(self.pagination_query_param))
+        self.delegate = mode() if mode else None
+        if self.delegate is None:
+            return super().paginate_queryset(queryset, request, view)
+        self.display_page_controls = False
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.delegate is None:
+            return super().get_paginated_response(data)
+        return self.delegate.get_paginated_response(data)
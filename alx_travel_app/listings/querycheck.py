@@ -0,0 +1,113 @@
+"""Slow query and N+1 detection.
+
+``QueryInspector`` is a database ``execute_wrapper`` that groups the
+statements it sees by shape: the SQL with literals replaced by ``?`` and
+placeholder lists collapsed. A request repeating one shape at least
+``N_PLUS_ONE_THRESHOLD`` times is usually running one query per row
+(N+1). A statement taking at least ``SLOW_QUERY_MS`` is slow. Either way
+the inspector keeps the project frames of the stack that ran it, which
+point at the calling view or serializer.
+
+``PerformanceMiddleware`` inspects every request and logs its findings as
+JSON warnings on the ``alx_travel_app.performance.queries`` logger. Tests
+can use an inspector directly to assert that a request has no repeated
+statements.
+"""
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger('alx_travel_app.performance.queries')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+# Savepoints repeat in every write and say nothing about the queries.
+_TRANSACTION = re.compile(r'(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT)\b')
+
+
+def normalize(sql):
+    """Return the shape of a statement: literals become ``?`` and ``IN`` lists ``(...)``."""
+    sql = _NUMBER.sub('?', _STRING.sub('?', sql))
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+# Frames of the wrappers that time queries and serializers, not callers.
+_SKIPPED = {__file__, os.path.join(os.path.dirname(__file__), 'metrics.py')}
+
+
+def caller_stack(limit=8):
+    """Return the innermost project frames of the current stack, outermost first."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root) and frame.filename not in _SKIPPED
+        and f'{os.sep}site-packages{os.sep}' not in frame.filename
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}'
+        for frame in frames[-limit:]
+    ]
+
+
+class QueryInspector:
+    """Group executed statements by shape and keep the repeated and slow ones.
+
+    ``repeat_threshold`` and ``slow_ms`` default to the ``N_PLUS_ONE_THRESHOLD``
+    and ``SLOW_QUERY_MS`` settings; 0 turns a check off.
+    """
+
+    def __init__(self, repeat_threshold=None, slow_ms=None):
+        if repeat_threshold is None:
+            repeat_threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 5)
+        if slow_ms is None:
+            slow_ms = getattr(settings, 'SLOW_QUERY_MS', 100)
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self.counts = Counter()
+        self.seconds = defaultdict(float)
+        self.stacks = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.inspect(sql, time.perf_counter() - start)
+
+    def inspect(self, sql, seconds):
+        shape = normalize(sql)
+        self.counts[shape] += 1
+        self.seconds[shape] += seconds
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            self.slow.append((shape, seconds, caller_stack()))
+        if self.counts[shape] == self.repeat_threshold and not _TRANSACTION.match(shape):
+            self.stacks[shape] = caller_stack()
+
+    def repeated(self):
+        """Return ``(shape, count, seconds, stack)`` of each statement repeated too often."""
+        return [
+            (shape, self.counts[shape], self.seconds[shape], stack)
+            for shape, stack in self.stacks.items()
+        ]
+
+    def report(self, method, path, route):
+        """Log each repeated and slow statement as a JSON warning."""
+        request = {'method': method, 'path': path, 'route': route}
+        for shape, count, seconds, stack in self.repeated():
+            logger.warning(json.dumps({
+                'problem': 'repeated_query', **request, 'count': count,
+                'total_ms': round(seconds * 1000, 2), 'sql': shape, 'stack': stack,
+            }))
+        for shape, seconds, stack in self.slow:
+            logger.warning(json.dumps({
+                'problem': 'slow_query', **request, 'ms': round(seconds * 1000, 2),
+                'sql': shape, 'stack': stack,
+            }))
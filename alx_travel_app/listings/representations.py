@@ -0,0 +1,109 @@
+"""Cache of serialized listing representations.
+
+When ``LISTING_REPRESENTATION_CACHE_TIMEOUT`` is set, listing reads look
+up each listing's serialized form with one ``get_many``. Only the misses
+are serialized: their reviews and amenities are prefetched first, and the
+results are stored with one ``set_many``.
+
+Fragments are keyed by listing id, ``updated_at``, the listing's version
+tag and the selected fields. The tag is bumped by review and amenity
+writes and by changes to the host or a reviewer (see ``signals.py``), so
+a write never serves an old fragment, while other user writes, such as
+signups, leave the fragments alone. ``distance`` depends on the request,
+so it is filled in live.
+
+Hit and miss counts are kept in the cache; see ``stats()``. With a
+per-process cache, such as the default local memory one, each process
+counts its own: read them from the server's ``/metrics``.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import prefetch_related_objects
+
+from .caching import get_versions, listing_tag, response_cache
+
+STATS_KEYS = {'hits': 'listing-repr-stats:hits', 'misses': 'listing-repr-stats:misses'}
+
+
+def cache_timeout():
+    return getattr(settings, 'LISTING_REPRESENTATION_CACHE_TIMEOUT', 0)
+
+
+def cache_enabled(request):
+    """Return whether listings read by ``request`` use the representation cache."""
+    return bool(cache_timeout()) and request is not None and request.method in ('GET', 'HEAD')
+
+
+def fragment_keys(listings, field_names):
+    """Return the cache key of each listing's representation."""
+    versions = get_versions([listing_tag(listing.pk) for listing in listings])
+    signature = hashlib.sha256(','.join(field_names).encode()).hexdigest()[:16]
+    return [
+        f'listing-repr:{listing.pk}:{listing.updated_at.timestamp()}:{version}:{signature}'
+        for listing, version in zip(listings, versions)
+    ]
+
+
+def cached_representations(serializer, listings):
+    """Represent ``listings`` with a ``ListingSerializer``, serializing only cache misses.
+
+    Relations listed in the serializer context's ``listing_prefetches`` are
+    prefetched for the misses only.
+    """
+    if not listings:
+        return []
+    cache = response_cache()
+    keys = fragment_keys(listings, list(serializer.fields))
+    cached = cache.get_many(keys)
+    missed = [listing for listing, key in zip(listings, keys) if key not in cached]
+    if missed:
+        prefetches = serializer.context.get('listing_prefetches', [])
+        if prefetches:
+            prefetch_related_objects(missed, *prefetches)
+        fresh = {
+            key: serializer.serialize(listing)
+            for listing, key in zip(listings, keys) if key not in cached
+        }
+        cache.set_many(fresh, cache_timeout())
+        cached.update(fresh)
+    record(hits=len(listings) - len(missed), misses=len(missed))
+
+    representations = []
+    for listing, key in zip(listings, keys):
+        representation = cached[key]
+        if 'distance' in representation:
+            representation['distance'] = serializer.get_distance(listing)
+        representations.append(representation)
+    return representations
+
+
+def record(**counts):
+    cache = response_cache()
+    for name, count in counts.items():
+        if not count:
+            continue
+        try:
+            cache.incr(STATS_KEYS[name], count)
+        except ValueError:
+            if not cache.add(STATS_KEYS[name], count, None):
+                cache.incr(STATS_KEYS[name], count)
+
+
+def shared_stats():
+    """Return whether ``stats()`` covers every process, i.e. the cache is not per-process."""
+    return not isinstance(response_cache(), LocMemCache)
+
+
+def stats():
+    """Return the hit and miss counts and the hit rate of the cache."""
+    values = response_cache().get_many(list(STATS_KEYS.values()))
+    counts = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = counts['hits'] + counts['misses']
+    counts['hit_rate'] = counts['hits'] / total if total else 0.0
+    return counts
+
+
+def reset_stats():
+    response_cache().delete_many(list(STATS_KEYS.values()))
@@ -0,0 +1,193 @@
+"""Full-text search over listings.
+
+A search backend keeps an index of the searchable listing text in sync and
+turns ``?search=`` terms into a filtered queryset annotated with a
+``relevance`` score (higher is better). ``SQLiteFTS5Backend`` uses an FTS5
+virtual table with BM25 ranking; ``ContainsSearchBackend`` is the portable
+``icontains`` fallback. Set ``settings.LISTING_SEARCH_BACKEND`` to a dotted
+path to choose one explicitly. Otherwise each database connection checks
+once for the FTS5 table and, if it is missing, logs a warning and falls
+back; a new connection, e.g. after ``migrate``, checks again.
+"""
+import logging
+import re
+from functools import lru_cache, reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, FloatField, OuterRef, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import Amenity, Listing, ListingAmenity
+
+SEARCH_FIELDS = ['title', 'description', 'location', 'amenities']
+
+logger = logging.getLogger(__name__)
+
+
+def amenity_text(listing_ids):
+    """Map listing ids to their comma-separated amenity names with one query."""
+    names = {}
+    for listing_id, name in ListingAmenity.objects.filter(
+        listing_id__in=listing_ids
+    ).order_by('amenity__name').values_list('listing_id', 'amenity__name'):
+        names.setdefault(listing_id, []).append(name)
+    return {listing_id: ', '.join(values) for listing_id, values in names.items()}
+
+
+def searchable_text(listing, amenities=''):
+    """Return the indexed text of a listing, one value per ``SEARCH_FIELDS`` entry."""
+    return [listing.title, listing.description, listing.location, amenities]
+
+
+class ContainsSearchBackend:
+    """Case-insensitive substring matching, available on every database.
+
+    Every term must appear in at least one field; all matches rank equally.
+    """
+
+    def index(self, listings):
+        pass
+
+    def remove(self, listing_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+    def search(self, queryset, terms):
+        matches = [
+            reduce(or_, (
+                Q(title__icontains=term),
+                Q(description__icontains=term),
+                Q(location__icontains=term),
+                Q(Exists(ListingAmenity.objects.filter(
+                    listing=OuterRef('pk'), amenity__name__icontains=term
+                ))),
+            ))
+            for term in terms
+        ]
+        return queryset.filter(reduce(and_, matches)).annotate(
+            relevance=Value(0.0, output_field=FloatField())
+        )
+
+
+class SQLiteFTS5Backend:
+    """Tokenized, BM25-ranked matching backed by an SQLite FTS5 table.
+
+    The table is created by the ``0007_listing_search_index`` migration and
+    uses the listing id as its rowid. Terms are prefix-matched and all of
+    them must match.
+    """
+    table = 'listings_listing_fts'
+
+    def index(self, listings):
+        listings = list(listings)
+        if not listings:
+            return
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+        amenities = amenity_text([listing.pk for listing in listings])
+        with connection.cursor() as cursor:
+            self._delete(cursor, [listing.pk for listing in listings])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})',
+                [
+                    [listing.pk, *searchable_text(listing, amenities.get(listing.pk, ''))]
+                    for listing in listings
+                ],
+            )
+
+    def remove(self, listing_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, list(listing_ids))
+
+    def rebuild(self):
+        columns = ', '.join(SEARCH_FIELDS)
+        links, amenities = ListingAmenity._meta.db_table, Amenity._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {columns}) '
+                f'SELECT l.id, l.title, l.description, l.location, '
+                f"COALESCE((SELECT group_concat(a.name, ', ') FROM {links} la "
+                f"JOIN {amenities} a ON a.id = la.amenity_id WHERE la.listing_id = l.id), '') "
+                f'FROM {Listing._meta.db_table} l'
+            )
+            return cursor.rowcount
+
+    def search(self, queryset, terms):
+        query = self.match_query(terms)
+        if not query:
+            return queryset.none()
+        listing_id = f'{connection.ops.quote_name(Listing._meta.db_table)}.id'
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [query]
+        )).annotate(relevance=RawSQL(
+            f'SELECT -bm25({self.table}) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = {listing_id}',
+            [query],
+            output_field=FloatField(),
+        ))
+
+    def match_query(self, terms):
+        """Build an FTS5 query from user terms, dropping query syntax."""
+        tokens = [token for term in terms for token in re.findall(r'\w+', term)]
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def _delete(self, cursor, listing_ids):
+        if listing_ids:
+            placeholders = ', '.join(['%s'] * len(listing_ids))
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', listing_ids)
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def _detect_backend():
+    """Pick the backend for the current connection, warning when FTS5 is unavailable."""
+    if connection.vendor != 'sqlite':
+        return ContainsSearchBackend()
+    if SQLiteFTS5Backend.table in connection.introspection.table_names():
+        return SQLiteFTS5Backend()
+    logger.warning(
+        'The %s table is missing, so listing search falls back to substring matching. '
+        'Run migrate to create it.', SQLiteFTS5Backend.table,
+    )
+    return ContainsSearchBackend()
+
+
+def forget_backend(connection):
+    """Make ``connection`` check for the FTS5 table again on its next search."""
+    connection.listing_search_backend = None
+
+
+def get_backend():
+    """Return the configured search backend."""
+    path = getattr(settings, 'LISTING_SEARCH_BACKEND', None)
+    if path:
+        return _load_backend(path)
+    connection.ensure_connection()
+    backend = getattr(connection, 'listing_search_backend', None)
+    if backend is None:
+        backend = connection.listing_search_backend = _detect_backend()
+    return backend
+
+
+class ListingSearchFilter(filters.SearchFilter):
+    """Route ``?search=`` through the listing search backend.
+
+    The queryset is always annotated with ``relevance`` so that
+    ``?ordering=-relevance`` works with or without a search.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset.annotate(relevance=Value(0.0, output_field=FloatField()))
+        return get_backend().search(queryset, terms)
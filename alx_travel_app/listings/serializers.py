@@ -1,9 +1,59 @@
+from django.db import models
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from .models import Listing, Booking, Review
+from .fastread import FastRepresentationMixin
+from .models import Listing, Booking, Review, parse_amenities
+from .representations import cache_enabled, cached_representations
 
 
-class UserSerializer(serializers.ModelSerializer):
+def _split_param(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_expansions(request):
+    """Return the related fields a client asked to expand via ``?expand=``."""
+    if request is None:
+        return set()
+    return _split_param(request.query_params.get('expand', ''))
+
+
+def sparse_fieldset(request, field_names):
+    """Return the ``field_names`` selected by the request's ``?fields=``/``?omit=``.
+
+    Only read requests are trimmed so that writes always validate the full
+    payload.
+    """
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return list(field_names)
+    fields = _split_param(request.query_params.get('fields', ''))
+    omit = _split_param(request.query_params.get('omit', ''))
+    return [
+        name for name in field_names
+        if (not fields or name in fields) and name not in omit
+    ]
+
+
+class SparseFieldsetMixin:
+    """Drop the fields a client did not request from the top-level serializer.
+
+    Nested serializers are left untouched; ``?fields=`` names refer to the
+    fields of the resource being requested.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if parent is not None and not (
+            isinstance(parent, serializers.ListSerializer) and parent.parent is None
+        ):
+            return fields
+        selected = sparse_fieldset(self.context.get('request'), fields)
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class UserSerializer(FastRepresentationMixin, serializers.ModelSerializer):
     """Serializer for User model."""
     
     class Meta:
@@ -12,47 +62,160 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
     """Serializer for Review model."""
     guest = UserSerializer(read_only=True)
     
     class Meta:
         model = Review
-        fields = ['id', 'guest', 'rating', 'comment', 'created_at', 'updated_at']
+        fields = [
+            'id', 'listing', 'booking', 'guest', 'rating', 'comment',
+            'created_at', 'updated_at'
+        ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def validate(self, data):
+        """Validate that the booking belongs to the reviewed listing."""
+        listing = data.get('listing', getattr(self.instance, 'listing', None))
+        booking = data.get('booking', getattr(self.instance, 'booking', None))
+        if listing and booking and booking.listing_id != listing.pk:
+            raise serializers.ValidationError("The booking does not belong to this listing.")
+        return data
+
+
+class AmenityListField(serializers.Field):
+    """Amenities as a comma-separated string of names, e.g. ``"Pool, WiFi"``.
+
+    A list of names is accepted on input as well.
+    """
+    default_error_messages = {
+        'invalid': 'Enter amenities as a comma-separated string or a list of names.',
+    }
+
+    def to_representation(self, value):
+        return ', '.join(amenity.name for amenity in value.all())
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and all(isinstance(name, str) for name in data):
+            data = ','.join(data)
+        if not isinstance(data, str):
+            self.fail('invalid')
+        return parse_amenities(data)
+
+
+class InBulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field that first looks ids up in the context's ``in_bulk``.
+
+    ``in_bulk`` maps models to the ``{pk: object}`` dicts that bulk endpoints
+    load for all their items with one query.
+    """
+
+    def to_internal_value(self, data):
+        objects = self.context.get('in_bulk', {}).get(self.get_queryset().model, {})
+        if isinstance(data, int) and not isinstance(data, bool) and data in objects:
+            return objects[data]
+        return super().to_internal_value(data)
+
+
+def prefetch_listings(serializer, listings):
+    """Prefetch the serializer context's ``listing_prefetches`` for top-level listings."""
+    prefetches = serializer.context.get('listing_prefetches', [])
+    if serializer.parent is None and prefetches:
+        prefetch_related_objects(listings, *prefetches)
+
+
+class ListingListSerializer(serializers.ListSerializer):
+    """Lists listings through the representation cache on read requests."""
+
+    def to_representation(self, data):
+        listings = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if self.parent is not None or not cache_enabled(self.context.get('request')):
+            listings = list(listings)
+            prefetch_listings(self, listings)
+            return super().to_representation(listings)
+        return cached_representations(self.child, list(listings))
 
-class ListingSerializer(serializers.ModelSerializer):
+
+class ListingSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
     """Serializer for the Listing model."""
     host = UserSerializer(read_only=True)
+    amenities = AmenityListField(required=False)
     reviews = ReviewSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
-    review_count = serializers.SerializerMethodField()
+    distance = serializers.SerializerMethodField()
     
     class Meta:
         model = Listing
         fields = [
-            'id', 'title', 'description', 'price', 'location', 'property_type',
-            'bedrooms', 'bathrooms', 'max_guests', 'amenities', 'is_available',
-            'host', 'reviews', 'average_rating', 'review_count', 'created_at', 'updated_at'
+            'id', 'title', 'description', 'price', 'location', 'latitude', 'longitude',
+            'distance', 'property_type', 'bedrooms', 'bathrooms', 'max_guests', 'amenities',
+            'is_available', 'host', 'reviews', 'average_rating', 'review_count',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'host']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'host', 'review_count']
+        list_serializer_class = ListingListSerializer
+
+    def to_representation(self, instance):
+        if self.parent is None and cache_enabled(self.context.get('request')):
+            return cached_representations(self, [instance])[0]
+        prefetch_listings(self, [instance])
+        return super().to_representation(instance)
+
+    def serialize(self, instance):
+        """Represent a listing without the representation cache."""
+        return super().to_representation(instance)
+
+    def validate(self, data):
+        """Validate that coordinates are given as a pair."""
+        latitude = data.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = data.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError("Provide both latitude and longitude.")
+        return data
+
+    def create(self, validated_data):
+        amenities = validated_data.pop('amenities', [])
+        listing = super().create(validated_data)
+        listing.set_amenities(amenities)
+        return listing
+
+    def update(self, instance, validated_data):
+        amenities = validated_data.pop('amenities', None)
+        listing = super().update(instance, validated_data)
+        if amenities is not None:
+            listing.set_amenities(amenities)
+        return listing
     
     def get_average_rating(self, obj):
-        """Calculate average rating for the listing."""
-        reviews = obj.reviews.all()
-        if reviews:
-            return round(sum(review.rating for review in reviews) / len(reviews), 2)
+        """Return the stored average rating rounded to two decimals."""
+        if obj.average_rating:
+            return round(obj.average_rating, 2)
         return 0
-    
-    def get_review_count(self, obj):
-        """Get total number of reviews for the listing."""
-        return obj.reviews.count()
 
+    def get_distance(self, obj):
+        """Return the distance in km from a ``?near=`` point, if one was given."""
+        distance = getattr(obj, 'distance', None)
+        if distance is None:
+            return None
+        return round(distance, 3)
+
+
+class ListingSummarySerializer(FastRepresentationMixin, serializers.ModelSerializer):
+    """Compact listing representation used when nesting listings."""
+
+    class Meta:
+        model = Listing
+        fields = ['id', 'title', 'location', 'price', 'host']
+        read_only_fields = fields
+
+
+class BookingSerializer(SparseFieldsetMixin, FastRepresentationMixin, serializers.ModelSerializer):
+    """Serializer for the Booking model.
 
-class BookingSerializer(serializers.ModelSerializer):
-    """Serializer for the Booking model."""
-    listing = ListingSerializer(read_only=True)
+    The nested listing uses ``ListingSummarySerializer`` unless the request
+    asks for ``?expand=listing``.
+    """
+    listing = ListingSummarySerializer(read_only=True)
     guest = UserSerializer(read_only=True)
     listing_id = serializers.IntegerField(write_only=True)
     guest_id = serializers.IntegerField(write_only=True)
@@ -65,10 +228,19 @@ class BookingSerializer(serializers.ModelSerializer):
             'special_requests', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+    def get_fields(self):
+        """Swap in the full listing representation when it is expanded."""
+        fields = super().get_fields()
+        if 'listing' in fields and 'listing' in requested_expansions(self.context.get('request')):
+            fields['listing'] = ListingSerializer(read_only=True)
+        return fields
     
     def validate(self, data):
         """Validate booking data."""
-        if data['check_in'] >= data['check_out']:
+        check_in = data.get('check_in', getattr(self.instance, 'check_in', None))
+        check_out = data.get('check_out', getattr(self.instance, 'check_out', None))
+        if check_in and check_out and check_in >= check_out:
             raise serializers.ValidationError("Check-out date must be after check-in date.")
         return data
 
@@ -79,12 +251,59 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = [
-            'listing', 'guest', 'check_in', 'check_out', 
+            'id', 'listing', 'guest', 'check_in', 'check_out', 
             'total_price', 'special_requests'
         ]
+        read_only_fields = ['id', 'guest']
+
+    serializer_related_field = InBulkPrimaryKeyRelatedField
+
+    def get_validators(self):
+        """Leave stays already taken to ``bulk.create_bookings`` in bulk requests.
+
+        It checks every item with one query instead of one per item.
+        """
+        if 'in_bulk' in self.context:
+            return []
+        return super().get_validators()
     
     def validate(self, data):
         """Validate booking data."""
         if data['check_in'] >= data['check_out']:
             raise serializers.ValidationError("Check-out date must be after check-in date.")
-        return data 
\ No newline at end of file
+        return data 
+
+class BookingStatusChangeSerializer(serializers.Serializer):
+    """Booking ids to confirm or cancel at once."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+    status = serializers.ChoiceField(choices=['confirmed', 'cancelled'])
+
+
+class ApiTokenRequestSerializer(serializers.Serializer):
+    """Credentials exchanged for a new API token.
+
+    ``username`` and ``password`` may be left out when the request is
+    already authenticated.
+    """
+    username = serializers.CharField(required=False)
+    password = serializers.CharField(
+        required=False, write_only=True, style={'input_type': 'password'}
+    )
+    name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+
+    def validate(self, data):
+        request = self.context['request']
+        if 'username' in data or 'password' in data:
+            user = authenticate(
+                request=request, username=data.get('username'), password=data.get('password')
+            )
+            if user is None:
+                raise serializers.ValidationError("Unable to log in with the provided credentials.")
+        elif request.user.is_authenticated:
+            user = request.user
+        else:
+            raise serializers.ValidationError("Provide a username and password.")
+        data['user'] = user
+        return data
@@ -0,0 +1,201 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .availability import sync_calendar
+from .caching import invalidate, listing_tag
+from .models import Booking, Change, Listing, Review
+from .search import forget_backend, get_backend
+
+
+def deleted_with_listing(origin):
+    """Tell whether a delete cascades from listings, whose own signals cover it."""
+    return isinstance(origin, Listing) or getattr(origin, 'model', None) is Listing
+
+
+@receiver(connection_created)
+def check_search_backend(sender, connection, **kwargs):
+    """Look for the search index again on new database connections."""
+    forget_backend(connection)
+
+
+@receiver(post_save, sender=Listing)
+def index_listing(sender, instance, **kwargs):
+    """Keep the search index in step with saved listings."""
+    get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Listing)
+def unindex_listing(sender, instance, **kwargs):
+    """Drop deleted listings from the search index."""
+    get_backend().remove([instance.pk])
+
+
+@receiver(m2m_changed, sender=Listing.amenities.through)
+def reindex_amenities(sender, instance, action, reverse, pk_set, **kwargs):
+    """Re-index and invalidate listings whose amenities were added or removed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        get_backend().index([instance])
+        invalidate(listing_tag(instance.pk), 'listings')
+    elif pk_set:
+        get_backend().index(Listing.objects.filter(pk__in=pk_set))
+        invalidate(*map(listing_tag, pk_set), 'listings')
+    else:
+        invalidate('all')
+
+
+@receiver(m2m_changed, sender=Listing.amenities.through)
+def touch_amenity_listings(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump ``updated_at`` of listings whose amenities changed, for incremental exports."""
+    now = timezone.now()
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.updated_at = now
+        Listing.objects.filter(pk=instance.pk).update(updated_at=now)
+    elif reverse and action in ('post_add', 'post_remove'):
+        Listing.objects.filter(pk__in=pk_set).update(updated_at=now)
+    elif reverse and action == 'pre_clear':
+        instance.listings.update(updated_at=now)
+
+
+@receiver([post_save, post_delete], sender=Listing)
+def invalidate_listing(sender, instance, **kwargs):
+    """Drop cached responses showing a written listing."""
+    invalidate(listing_tag(instance.pk), 'listings')
+
+
+@receiver(pre_save, sender=Review)
+def remember_stored_rating(sender, instance, raw, **kwargs):
+    """Look up the stored rating of a review saved without loading it first."""
+    if raw or instance.pk is None:
+        return
+    if None in getattr(instance, 'stored_rating', (None, None)):
+        instance.stored_rating = Review.objects.filter(pk=instance.pk).values_list(
+            'listing_id', 'rating'
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+def apply_saved_rating(sender, instance, created, raw, **kwargs):
+    """Move a saved review's rating into the listing rating columns."""
+    if raw:
+        return
+    previous = None if created else getattr(instance, 'stored_rating', None)
+    if previous is None:
+        Listing.apply_review_change(instance.listing_id, instance.rating, 1)
+    elif previous[0] == instance.listing_id:
+        Listing.apply_review_change(instance.listing_id, instance.rating - previous[1], 0)
+    else:
+        Listing.apply_review_change(previous[0], -previous[1], -1)
+        Listing.apply_review_change(instance.listing_id, instance.rating, 1)
+    instance.stored_rating = (instance.listing_id, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def remove_deleted_rating(sender, instance, origin=None, **kwargs):
+    """Remove a review's rating however it is deleted, cascades included.
+
+    Reviews deleted along with their listing leave no rating to fix.
+    """
+    if deleted_with_listing(origin):
+        return
+    Listing.apply_review_change(instance.listing_id, -instance.rating, -1)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_reviewed_listing(sender, instance, origin=None, **kwargs):
+    """Drop cached responses showing the reviews of a listing."""
+    if deleted_with_listing(origin):
+        return
+    invalidate(listing_tag(instance.listing_id), 'listings')
+
+
+@receiver(post_save, sender=Booking)
+def sync_booking_calendar(sender, instance, raw, **kwargs):
+    """Write the calendar rows of bookings however they are saved.
+
+    Fixtures carry their own rows. Deleted bookings take their rows with them.
+    """
+    if not raw:
+        sync_calendar(instance)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_availability(sender, instance, **kwargs):
+    """Drop cached listing searches that filter on dates."""
+    invalidate('availability')
+
+
+def user_listing_tags(user):
+    """Return the tags of the listings that show a user, as host or reviewer."""
+    listing_ids = Listing.objects.filter(
+        Q(host=user) | Q(reviews__guest=user)
+    ).order_by().values_list('pk', flat=True).distinct()
+    return [listing_tag(listing_id) for listing_id in listing_ids]
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_users(sender, instance, update_fields=None, **kwargs):
+    """Drop cached responses nesting user details; logins do not change them."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    tags = user_listing_tags(instance)
+    if tags:
+        invalidate(*tags, 'listings')
+
+
+@receiver(post_save, sender=Listing)
+def log_listing_change(sender, instance, **kwargs):
+    """Append saved listings to the change feed."""
+    Change.objects.record('listing', [instance.pk])
+
+
+@receiver(post_delete, sender=Listing)
+def log_listing_deletion(sender, instance, **kwargs):
+    Change.objects.record('listing', [instance.pk], 'delete')
+
+
+@receiver([post_save, post_delete], sender=Review)
+def log_reviewed_listing_change(sender, instance, origin=None, **kwargs):
+    """Reviews are part of the listing representation."""
+    if deleted_with_listing(origin):
+        return
+    Change.objects.record('listing', [instance.listing_id])
+
+
+@receiver(m2m_changed, sender=Listing.amenities.through)
+def log_amenity_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Append listings whose amenities were added or removed to the change feed."""
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        Change.objects.record('listing', [instance.pk])
+    elif reverse and action in ('post_add', 'post_remove'):
+        Change.objects.record('listing', pk_set)
+    elif reverse and action == 'pre_clear':
+        Change.objects.record('listing', instance.listings.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Booking)
+def log_booking_change(sender, instance, **kwargs):
+    """Append saved bookings to the change feed."""
+    Change.objects.record_booking(instance)
+
+
+@receiver(pre_delete, sender=Booking)
+def log_booking_deletion(sender, instance, origin=None, **kwargs):
+    # Before the delete, so that the listing's host can still be looked up.
+    if not deleted_with_listing(origin):
+        Change.objects.record_booking(instance, 'delete')
+
+
+@receiver(pre_delete, sender=Listing)
+def log_listing_bookings_deletion(sender, instance, origin=None, **kwargs):
+    """Log the bookings of deleted listings in one insert rather than one each."""
+    if deleted_with_listing(origin):
+        Change.objects.record_bookings(instance.bookings.all(), 'delete')
+
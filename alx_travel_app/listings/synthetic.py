@@ -0,0 +1,241 @@
+"""Reproducible sample data for development and load-test databases.
+
+``seed --bulk`` builds its rows here. Rows are generated in partitions of
+``PARTITION_SIZE``, each drawing from its own ``random.Random`` seeded with
+the dataset seed, the model and the partition number. A dataset therefore
+depends only on the seed, the row counts and the start date, not on how
+many processes generate it or how its rows are batched on the way to the
+database.
+
+Rows are plain dicts of model field values, cheap to send between
+processes. Related rows are given by their index in the dataset
+(``host``, ``listing``, ``guest`` and ``booking``); the writer maps
+indexes to primary keys.
+
+Booking ``i`` is stay number ``i // listings`` of listing ``i % listings``
+and falls in its own ``SLOT_DAYS`` window, so stays never overlap. The
+first ``reviews`` bookings are completed, and review ``i`` is of booking
+``i``.
+"""
+import random
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+
+from . import geo
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Mike', 'Sarah', 'David', 'Lisa', 'Chris', 'Emma',
+    'Alex', 'Maria', 'Tom', 'Anna', 'James', 'Sophie', 'Robert', 'Lucy'
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+    'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez',
+    'Wilson', 'Anderson', 'Thomas'
+]
+
+PROPERTY_TYPES = ['apartment', 'house', 'condo', 'villa', 'studio']
+
+# City centres; listings are scattered a few kilometres around them.
+LOCATIONS = {
+    'New York, NY': (40.7128, -74.0060), 'Los Angeles, CA': (34.0522, -118.2437),
+    'Chicago, IL': (41.8781, -87.6298), 'Houston, TX': (29.7604, -95.3698),
+    'Phoenix, AZ': (33.4484, -112.0740), 'Philadelphia, PA': (39.9526, -75.1652),
+    'San Antonio, TX': (29.4241, -98.4936), 'San Diego, CA': (32.7157, -117.1611),
+    'Dallas, TX': (32.7767, -96.7970), 'San Jose, CA': (37.3382, -121.8863),
+    'Austin, TX': (30.2672, -97.7431), 'Jacksonville, FL': (30.3322, -81.6557),
+    'Fort Worth, TX': (32.7555, -97.3308), 'Columbus, OH': (39.9612, -82.9988),
+    'Charlotte, NC': (35.2271, -80.8431), 'San Francisco, CA': (37.7749, -122.4194),
+    'Indianapolis, IN': (39.7684, -86.1581), 'Seattle, WA': (47.6062, -122.3321),
+    'Denver, CO': (39.7392, -104.9903), 'Washington, DC': (38.9072, -77.0369),
+}
+
+TITLES = [
+    'Cozy Apartment in Downtown', 'Beautiful House with Garden',
+    'Modern Condo with City View', 'Luxury Villa by the Beach',
+    'Charming Studio in Historic District', 'Spacious Family Home',
+    'Elegant Apartment with Balcony', 'Rustic Cabin in the Woods',
+    'Contemporary Loft', 'Traditional House with Pool',
+    'Penthouse with Panoramic Views', 'Cottage by the Lake',
+    'Urban Apartment Near Metro', 'Mountain Retreat',
+    'Beachfront Condo', 'Historic Brownstone',
+    'Modern Townhouse', 'Garden Apartment',
+    'Luxury Penthouse', 'Cozy Bungalow'
+]
+
+DESCRIPTIONS = [
+    'A beautiful and comfortable space perfect for your stay.',
+    'Modern amenities and stunning views await you here.',
+    'Experience luxury and comfort in this amazing property.',
+    'Perfect location with easy access to all attractions.',
+    'A home away from home with all the comforts you need.',
+    'Stunning architecture and thoughtful design throughout.',
+    'Prime location with excellent transportation links.',
+    'Peaceful retreat in the heart of the city.',
+    'Spacious and well-appointed for your perfect getaway.',
+    'Charming property with character and modern conveniences.'
+]
+
+AMENITIES = [
+    'WiFi, Air Conditioning, Kitchen, Parking',
+    'WiFi, Pool, Gym, Balcony',
+    'WiFi, Hot Tub, Fireplace, Garden',
+    'WiFi, Air Conditioning, Kitchen, Washer',
+    'WiFi, Pool, Gym, Balcony, Parking',
+    'WiFi, Hot Tub, Fireplace, Garden, Pool',
+    'WiFi, Air Conditioning, Kitchen, Balcony',
+    'WiFi, Pool, Gym, Parking, Washer',
+    'WiFi, Hot Tub, Fireplace, Garden, Pool, Gym',
+    'WiFi, Air Conditioning, Kitchen, Balcony, Parking'
+]
+
+STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+STATUS_WEIGHTS = [0.1, 0.6, 0.25, 0.05]  # Weighted distribution
+
+COMMENTS = [
+    'Excellent stay! Highly recommended.',
+    'Great location and very clean.',
+    'Perfect for our family vacation.',
+    'Beautiful property with amazing views.',
+    'Host was very responsive and helpful.',
+    'Would definitely stay here again.',
+    'Clean, comfortable, and well-equipped.',
+    'Great value for money.',
+    'Lovely place with character.',
+    'Perfect location for exploring the city.',
+    'Amazing amenities and great service.',
+    'Very comfortable and spacious.',
+    'Host went above and beyond.',
+    'Beautiful property, highly recommend.',
+    'Great experience overall.',
+    'Clean, modern, and well-maintained.',
+    'Perfect for a weekend getaway.',
+    'Excellent communication from host.',
+    'Lovely place with great atmosphere.',
+    'Would book again in a heartbeat.'
+]
+
+SPECIAL_REQUESTS = [
+    '', 'Late check-in requested', 'Early check-in if possible',
+    'Quiet hours please', 'Extra towels needed', '',
+    'Pet-friendly accommodation', 'Wheelchair accessible needed', ''
+]
+
+
+def random_user_fields(i, rng=random):
+    first_name = rng.choice(FIRST_NAMES)
+    last_name = rng.choice(LAST_NAMES)
+    username = f"{first_name.lower()}{last_name.lower()}{i}"
+    return {
+        'username': username,
+        'email': f"{username}@example.com",
+        'first_name': first_name,
+        'last_name': last_name,
+    }
+
+
+def random_listing_fields(rng=random):
+    location = rng.choice(list(LOCATIONS))
+    latitude, longitude = LOCATIONS[location]
+    return {
+        'title': rng.choice(TITLES),
+        'description': rng.choice(DESCRIPTIONS),
+        'price': Decimal(rng.uniform(50, 500)).quantize(Decimal('0.01')),
+        'location': location,
+        'latitude': round(latitude + rng.uniform(-0.05, 0.05), 6),
+        'longitude': round(longitude + rng.uniform(-0.05, 0.05), 6),
+        'property_type': rng.choice(PROPERTY_TYPES),
+        'bedrooms': rng.randint(1, 5),
+        'bathrooms': rng.randint(1, 3),
+        'max_guests': rng.randint(1, 8),
+        'is_available': rng.choice([True, True, True, False]),  # 75% available
+    }
+
+
+PARTITION_SIZE = 10000
+SLOT_DAYS = 10
+MODELS = ('users', 'listings', 'bookings', 'reviews')
+
+
+def user_rows(rng, indexes, dataset):
+    return [random_user_fields(i, rng) for i in indexes]
+
+
+def listing_rows(rng, indexes, dataset):
+    rows = []
+    for _ in indexes:
+        row = random_listing_fields(rng)
+        row['geohash'] = geo.encode(row['latitude'], row['longitude'])
+        row['host'] = rng.randrange(dataset['users'])
+        row['amenities'] = rng.choice(AMENITIES)
+        rows.append(row)
+    return rows
+
+
+def booking_rows(rng, indexes, dataset):
+    listings = dataset['listings']
+    rows = []
+    for i in indexes:
+        slot = dataset['start_date'] + timedelta(days=i // listings * SLOT_DAYS)
+        check_in = slot + timedelta(days=rng.randint(0, 2))
+        rows.append({
+            'listing': i % listings,
+            'guest': rng.randrange(dataset['users']),
+            'check_in': check_in,
+            'check_out': check_in + timedelta(days=rng.randint(1, 7)),
+            'status': 'completed' if i < dataset['reviews'] else rng.choices(
+                STATUSES, weights=STATUS_WEIGHTS
+            )[0],
+            'special_requests': rng.choice(SPECIAL_REQUESTS),
+        })
+    return rows
+
+
+def review_rows(rng, indexes, dataset):
+    return [
+        {'booking': i, 'rating': rng.randint(3, 5), 'comment': rng.choice(COMMENTS)}
+        for i in indexes
+    ]
+
+
+GENERATORS = {
+    'users': user_rows,
+    'listings': listing_rows,
+    'bookings': booking_rows,
+    'reviews': review_rows,
+}
+
+
+def generate_partition(task):
+    """Return the rows of one partition of a model."""
+    model, number, dataset = task
+    rng = random.Random(f"{dataset['seed']}:{model}:{number}")
+    start = number * PARTITION_SIZE
+    indexes = range(start, min(start + PARTITION_SIZE, dataset[model]))
+    return GENERATORS[model](rng, indexes, dataset)
+
+
+def generate(model, dataset, pool=None, ahead=1):
+    """Yield the rows of ``model`` in dataset order.
+
+    ``dataset`` maps ``seed``, ``start_date`` and each of ``MODELS`` to its
+    row count. With a ``multiprocessing`` ``pool``, partitions are
+    generated in its workers, at most ``ahead`` of them ahead of the
+    consumer so memory stays flat when writing is the bottleneck.
+    """
+    tasks = (
+        (model, number, dataset)
+        for number in range(-(-dataset[model] // PARTITION_SIZE))
+    )
+    if pool is None:
+        for task in tasks:
+            yield from generate_partition(task)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(generate_partition, (task,)))
+        if len(pending) > ahead:
+            yield from pending.popleft().get()
+    while pending:
+        yield from pending.popleft().get()
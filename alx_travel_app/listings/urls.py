@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ListingViewSet, BookingViewSet, ReviewViewSet
+from .views import ListingViewSet, BookingViewSet, ReviewViewSet, ApiTokenView, ChangeFeedView
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -10,5 +10,7 @@ router.register(r'reviews', ReviewViewSet)
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
+    path('auth/token/', ApiTokenView.as_view(), name='api-token'),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,18 +1,109 @@
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Listing, Booking, Review
-from .serializers import ListingSerializer, BookingSerializer, BookingCreateSerializer, ReviewSerializer
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from operator import itemgetter
+from .bulk import (
+    bulk_items, change_status, create_bookings, create_listings, update_listings, validate_items,
+)
+from .exports import ExportMixin
+from .facets import facets_cache_key, listing_facets
+from .filters import ListingFilter, ListingOrderingFilter
+from .search import SEARCH_FIELDS, ListingSearchFilter
+from .availability import (
+    BookingConflict, CalendarConflict, ensure_available, free_ranges, lock_listing, reserve,
+)
+from .authentication import BearerTokenAuthentication
+from .changes import (
+    DEFAULT_LIMIT, MAX_LIMIT, RESOURCES, cursor_expired, latest_cursor, read_changes,
+)
+from .caching import cached_response, get_versions, listing_tag, response_cache, search_tags
+from .representations import cache_enabled as representation_cache_enabled
+from .models import ApiToken, Listing, Booking, Review
+from .serializers import (
+    ListingSerializer, BookingSerializer, BookingCreateSerializer, ReviewSerializer,
+    BookingStatusChangeSerializer, ApiTokenRequestSerializer, requested_expansions, sparse_fieldset,
+)
 
 
 # Create your views here.
 
+# Maximum number of most recent reviews embedded per listing; the full list
+# is available from the listing ``reviews`` action.
+REVIEW_PREVIEW_LIMIT = 10
 
-class ListingViewSet(viewsets.ModelViewSet):
+
+def review_preview_queryset(limit):
+    """Return the reviews embedded in listings, newest ``limit`` per listing."""
+    reviews = Review.objects.select_related('guest')
+    if limit is None:
+        return reviews
+    return reviews.latest_per_listing(limit)
+
+
+def parse_date_param(request, name, default):
+    """Parse an ISO date query parameter, raising a 400 when it is malformed."""
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ['Enter a valid date in YYYY-MM-DD format.']})
+    return parsed
+
+
+def defer_unselected(queryset, serializer_class, selected):
+    """Defer the model columns a sparse fieldset leaves out of the response."""
+    deferred = [
+        field.name for field in queryset.model._meta.concrete_fields
+        if not field.primary_key and not field.is_relation
+        and field.name in serializer_class.Meta.fields and field.name not in selected
+    ]
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+def bulk_response(key, data, errors, success_status=status.HTTP_200_OK):
+    """Report a bulk write: ``207`` when only some items were written, ``400`` when none were."""
+    if not errors:
+        code = success_status
+    elif data:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    return Response({key: data, 'errors': errors}, status=code)
+
+
+def booking_query_plan(queryset, request):
+    """Join or prefetch everything ``BookingSerializer`` reads for a request."""
+    selected = sparse_fieldset(request, BookingSerializer.Meta.fields)
+    queryset = defer_unselected(queryset, BookingSerializer, selected)
+    if 'guest' in selected:
+        queryset = queryset.select_related('guest')
+    if 'listing' in selected:
+        queryset = queryset.select_related('listing', 'listing__host')
+        if 'listing' in requested_expansions(request):
+            queryset = queryset.prefetch_related('listing__amenities', Prefetch(
+                'listing__reviews',
+                queryset=review_preview_queryset(REVIEW_PREVIEW_LIMIT),
+            ))
+    return queryset
+
+
+class ListingViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing listing instances.
     Provides full CRUD operations for property listings.
@@ -20,11 +111,71 @@ class ListingViewSet(viewsets.ModelViewSet):
     queryset = Listing.objects.all()
     serializer_class = ListingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['property_type', 'is_available', 'bedrooms', 'bathrooms', 'host']
-    search_fields = ['title', 'description', 'location', 'amenities']
-    ordering_fields = ['price', 'created_at', 'updated_at', 'average_rating']
+    filter_backends = [DjangoFilterBackend, ListingSearchFilter, ListingOrderingFilter]
+    filterset_class = ListingFilter
+    search_fields = SEARCH_FIELDS
+    ordering_fields = [
+        'price', 'created_at', 'updated_at', 'average_rating', 'relevance', 'distance',
+    ]
     ordering = ['-created_at']
+    review_preview_limit = REVIEW_PREVIEW_LIMIT
+    max_availability_days = 366
+    bulk_max_items = 500
+
+    def get_queryset(self):
+        """Build the query plan used to serialize listings.
+
+        With the representation cache on, relations are prefetched by the
+        serializer for cache misses only, and ``updated_at`` is always loaded
+        for the cache keys.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'export'):
+            return queryset
+        selected = sparse_fieldset(self.request, ListingSerializer.Meta.fields)
+        cached = representation_cache_enabled(self.request)
+        queryset = defer_unselected(
+            queryset, ListingSerializer, [*selected, 'updated_at'] if cached else selected
+        )
+        if 'host' in selected:
+            queryset = queryset.select_related('host')
+        if cached:
+            return queryset
+        return queryset.prefetch_related(*self.get_listing_prefetches())
+
+    def get_listing_prefetches(self):
+        """Return the relations prefetched to serialize the requested listing fields."""
+        selected = sparse_fieldset(self.request, ListingSerializer.Meta.fields)
+        prefetches = []
+        if 'host' in selected:
+            # Joined on reads; loaded here for the listings that writes return.
+            prefetches.append('host')
+        if 'amenities' in selected:
+            prefetches.append('amenities')
+        if 'reviews' in selected:
+            prefetches.append(Prefetch(
+                'reviews', queryset=review_preview_queryset(self.review_preview_limit)
+            ))
+        return prefetches
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['listing_prefetches'] = self.get_listing_prefetches()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """List listings, from the response cache for anonymous clients."""
+        return cached_response(
+            request, search_tags(request.query_params),
+            lambda: super(ListingViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Get a listing, from the response cache for anonymous clients."""
+        return cached_response(
+            request, [listing_tag(kwargs['pk'])],
+            lambda: super(ListingViewSet, self).retrieve(request, *args, **kwargs),
+        )
 
     def perform_create(self, serializer):
         """Set the host to the current user when creating a listing."""
@@ -34,20 +185,89 @@ class ListingViewSet(viewsets.ModelViewSet):
     def bookings(self, request, pk=None):
         """Get all bookings for a specific listing."""
         listing = self.get_object()
-        bookings = listing.bookings.all()
-        serializer = BookingSerializer(bookings, many=True)
+        bookings = booking_query_plan(listing.bookings.all(), request)
+        serializer = BookingSerializer(bookings, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """Get the free date ranges of a listing between ``from`` and ``to``."""
+        listing = self.get_object()
+        start = parse_date_param(request, 'from', default=timezone.localdate())
+        end = parse_date_param(request, 'to', default=start + timedelta(days=30))
+        if end <= start or (end - start).days > self.max_availability_days:
+            raise ValidationError({'to': [
+                f'Must be after "from" and at most {self.max_availability_days} days later.'
+            ]})
+        free = free_ranges(listing.pk, start, end)
+        return Response({
+            'listing': listing.pk,
+            'from': start,
+            'to': end,
+            'free': [{'check_in': check_in, 'check_out': check_out} for check_in, check_out in free],
+        })
+
+    @action(detail=False, methods=['get'])
+    def amenities(self, request):
+        """Count the listings offering each amenity among the filtered listings."""
+        listings = self.filter_queryset(self.get_queryset())
+        return Response(list(listings.amenity_counts()))
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Get facet counts for the listings matching the list filters and search."""
+        timeout = getattr(settings, 'LISTING_FACETS_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return Response(listing_facets(self.filter_queryset(self.get_queryset())))
+        key = facets_cache_key(request.query_params, get_versions(['all', *search_tags(request.query_params)]))
+        data = response_cache().get(key)
+        if data is None:
+            data = listing_facets(self.filter_queryset(self.get_queryset()))
+            response_cache().set(key, data, timeout)
+        return Response(data)
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """Create listings, or update the user's listings by ``id``, from a list."""
+        items = bulk_items(request.data, self.bulk_max_items)
+        context = self.get_serializer_context()
+        if request.method == 'POST':
+            valid, errors = validate_items(
+                items, lambda item: ListingSerializer(data=item, context=context)
+            )
+            listings = create_listings(
+                [serializer for _, serializer in valid], request.user
+            ) if valid else []
+            return bulk_response(
+                'created', self.bulk_representation(listings), errors, status.HTTP_201_CREATED
+            )
+
+        ids = [item.get('id') for item in items if isinstance(item.get('id'), int)]
+        owned = Listing.objects.filter(host=request.user).in_bulk(ids)
+
+        def make_serializer(item):
+            listing_id = item.get('id')
+            if not isinstance(listing_id, int) or listing_id not in owned:
+                return None
+            return ListingSerializer(owned[listing_id], data=item, partial=True, context=context)
+
+        valid, errors = validate_items(items, make_serializer)
+        listings = update_listings([serializer for _, serializer in valid]) if valid else []
+        return bulk_response('updated', self.bulk_representation(listings), errors)
+
+    def bulk_representation(self, listings):
+        return ListingSerializer(listings, many=True, context=self.get_serializer_context()).data
+
     @action(detail=True, methods=['get'])
     def reviews(self, request, pk=None):
         """Get all reviews for a specific listing."""
         listing = self.get_object()
-        reviews = listing.reviews.all()
+        reviews = listing.reviews.select_related('guest')
         serializer = ReviewSerializer(reviews, many=True)
         return Response(serializer.data)
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ExportMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing booking instances.
     Provides full CRUD operations for property bookings.
@@ -59,6 +279,7 @@ class BookingViewSet(viewsets.ModelViewSet):
     search_fields = ['listing__title', 'listing__location', 'special_requests']
     ordering_fields = ['check_in', 'check_out', 'total_price', 'created_at']
     ordering = ['-created_at']
+    bulk_max_items = 500
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
@@ -66,13 +287,49 @@ class BookingViewSet(viewsets.ModelViewSet):
             return BookingCreateSerializer
         return BookingSerializer
 
+    def handle_exception(self, exc):
+        """Answer ``409`` when another process booked the nights after they were checked."""
+        if isinstance(exc, CalendarConflict):
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return super().handle_exception(exc)
+
     def perform_create(self, serializer):
         """Set the guest to the current user when creating a booking."""
-        serializer.save(guest=self.request.user)
+        data = serializer.validated_data
+        self.save_stay(
+            serializer, data['listing'].pk, data['check_in'], data['check_out'],
+            guest=self.request.user,
+        )
+
+    def perform_update(self, serializer):
+        """Re-check availability when an active booking changes."""
+        booking, data = serializer.instance, serializer.validated_data
+        if data.get('status', booking.status) == 'cancelled':
+            serializer.save()
+            return
+        self.save_stay(
+            serializer,
+            data.get('listing_id', booking.listing_id),
+            data.get('check_in', booking.check_in),
+            data.get('check_out', booking.check_out),
+            exclude=booking.pk,
+        )
+
+    def save_stay(self, serializer, listing_id, check_in, check_out, exclude=None, **kwargs):
+        """Save the booking while holding the listing's reservation lock."""
+        try:
+            reserve(
+                lambda: serializer.save(**kwargs), listing_id, check_in, check_out,
+                exclude=exclude,
+            )
+        except CalendarConflict:
+            raise
+        except BookingConflict as exc:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [str(exc)]})
 
     def get_queryset(self):
         """Filter bookings based on user permissions."""
-        queryset = super().get_queryset()
+        queryset = booking_query_plan(super().get_queryset(), self.request)
         if self.request.user.is_authenticated:
             # Users can see their own bookings and bookings for their listings
             return queryset.filter(
@@ -90,11 +347,51 @@ class BookingViewSet(viewsets.ModelViewSet):
                 {'error': 'Only the listing host can confirm bookings.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        booking.status = 'confirmed'
-        booking.save()
-        serializer = BookingSerializer(booking)
+        try:
+            with lock_listing(booking.listing_id):
+                if booking.status == 'cancelled':
+                    ensure_available(
+                        booking.listing_id, booking.check_in, booking.check_out,
+                        exclude=booking.pk,
+                    )
+                booking.status = 'confirmed'
+                booking.save()
+        except BookingConflict as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        serializer = BookingSerializer(booking, context=self.get_serializer_context())
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create bookings for the current user from a list."""
+        items = bulk_items(request.data, self.bulk_max_items)
+        listing_ids = [item.get('listing') for item in items]
+        context = {**self.get_serializer_context(), 'in_bulk': {
+            Listing: Listing.objects.in_bulk([pk for pk in listing_ids if isinstance(pk, int)]),
+        }}
+        valid, errors = validate_items(
+            items, lambda item: BookingCreateSerializer(data=item, context=context)
+        )
+        created, conflicts = create_bookings(valid, request.user)
+        return bulk_response(
+            'created', BookingCreateSerializer(created, many=True).data,
+            sorted(errors + conflicts, key=itemgetter('index')), status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """Confirm (host only) or cancel many bookings by id."""
+        serializer = BookingStatusChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changed, errors = change_status(
+            request.user, serializer.validated_data['ids'], serializer.validated_data['status']
+        )
+        bookings = booking_query_plan(Booking.objects.filter(pk__in=changed), request)
+        context = self.get_serializer_context()
+        return bulk_response(
+            'updated', BookingSerializer(bookings, many=True, context=context).data, errors
+        )
+
     @action(detail=True, methods=['patch'])
     def cancel(self, request, pk=None):
         """Cancel a booking."""
@@ -106,7 +403,7 @@ class BookingViewSet(viewsets.ModelViewSet):
             )
         booking.status = 'cancelled'
         booking.save()
-        serializer = BookingSerializer(booking)
+        serializer = BookingSerializer(booking, context=self.get_serializer_context())
         return Response(serializer.data)
 
 
@@ -131,6 +428,10 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter reviews based on user permissions."""
         queryset = super().get_queryset()
+        selected = sparse_fieldset(self.request, ReviewSerializer.Meta.fields)
+        queryset = defer_unselected(queryset, ReviewSerializer, selected)
+        if 'guest' in selected:
+            queryset = queryset.select_related('guest')
         if self.request.user.is_authenticated:
             # Users can see reviews for their listings or their own reviews
             return queryset.filter(
@@ -138,3 +439,115 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 Q(guest=self.request.user)
             )
         return queryset.none()
+
+
+class ApiTokenView(APIView):
+    """
+    Issue and revoke API tokens.
+    POST exchanges a username and password (or an authenticated session)
+    for a new bearer token, which is only shown once. DELETE revokes the
+    bearer token the request was made with.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = ApiTokenRequestSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token, key = ApiToken.issue(
+            serializer.validated_data['user'], serializer.validated_data.get('name', '')
+        )
+        return Response(
+            {'token': key, 'name': token.name, 'created_at': token.created_at},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request):
+        if not isinstance(request.successful_authenticator, BearerTokenAuthentication):
+            raise NotAuthenticated('Authenticate with the bearer token to revoke.')
+        ApiToken.objects.get(key_hash=request.auth).revoke()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def parse_int_param(request, name, default, minimum=0, maximum=None):
+    """Parse an integer query parameter, raising a 400 when it is out of range."""
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        parsed = None
+    if parsed is None or parsed < minimum or (maximum is not None and parsed > maximum):
+        bound = f' and at most {maximum}' if maximum is not None else ''
+        raise ValidationError({name: [f'Enter a whole number of at least {minimum}{bound}.']})
+    return parsed
+
+
+class ChangeFeedView(APIView):
+    """
+    List the listings and bookings created, updated or deleted after a cursor.
+    Bookings are only included for their guest and their listing's host.
+    See ``changes.py``.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        param = request.query_params.get('resources', '')
+        names = {name.strip() for name in param.split(',') if name.strip()} or set(RESOURCES)
+        if not names <= set(RESOURCES):
+            raise ValidationError({'resources': [f'Choose from: {", ".join(RESOURCES)}.']})
+        resources = {RESOURCES[name] for name in names}
+        if 'cursor' not in request.query_params:
+            return Response({'cursor': latest_cursor(), 'has_more': False, 'changes': []})
+
+        cursor = parse_int_param(request, 'cursor', 0)
+        limit = parse_int_param(request, 'limit', DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+        if cursor_expired(cursor):
+            return Response(
+                {'error': 'Changes after this cursor were pruned; download everything again.'},
+                status=status.HTTP_410_GONE,
+            )
+        changes, next_cursor, has_more = read_changes(request.user, resources, cursor, limit)
+        return Response({
+            'cursor': next_cursor,
+            'has_more': has_more,
+            'changes': self.represent(changes),
+        })
+
+    def represent(self, changes):
+        """Pair each change with the record's current representation, if it still exists."""
+        upserts = {'listing': [], 'booking': []}
+        for change in changes:
+            if change.action == 'upsert':
+                upserts[change.resource].append(change.object_id)
+
+        listings = Listing.objects.filter(pk__in=upserts['listing']).select_related(
+            'host'
+        ).prefetch_related('amenities', Prefetch(
+            'reviews', queryset=review_preview_queryset(REVIEW_PREVIEW_LIMIT)
+        ))
+        bookings = Booking.objects.none()
+        if upserts['booking']:
+            bookings = booking_query_plan(Booking.objects.filter(
+                Q(guest=self.request.user) | Q(listing__host=self.request.user),
+                pk__in=upserts['booking'],
+            ), None)
+        current = {
+            'listing': dict(zip(
+                (listing.pk for listing in listings),
+                ListingSerializer(listings, many=True).data,
+            )),
+            'booking': dict(zip(
+                (booking.pk for booking in bookings),
+                BookingSerializer(bookings, many=True).data,
+            )),
+        }
+        return [
+            {
+                'resource': change.resource,
+                'id': change.object_id,
+                'action': 'upsert' if change.object_id in current[change.resource] else 'delete',
+                'data': current[change.resource].get(change.object_id),
+            }
+            for change in changes
+        ]
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'alx_travel_app.listings.metrics.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,6 +85,10 @@ WSGI_APPLICATION = 'alx_travel_app.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# SQLite has no row locks, so booking reservations are serialized by a lock
+# inside each process: run a single server process when writing bookings
+# to SQLite, or use a database with SELECT ... FOR UPDATE.
 
 DATABASES = {
     'default': {
@@ -140,13 +145,86 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'alx_travel_app.listings.authentication.BearerTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'alx_travel_app.listings.pagination.SelectablePagination',
     'PAGE_SIZE': 10,
 }
 
+# Cache backend, e.g. CACHE_URL=redis://127.0.0.1:6379/1 or
+# pymemcache://127.0.0.1:11211 in production. The default local-memory cache
+# is per process, so only use it for development and tests.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Cache alias and lifetime in seconds of anonymous listing list/detail
+# responses (0 disables). Writes invalidate cached responses through version
+# tags, so the timeout only bounds memory use.
+LISTING_RESPONSE_CACHE = env('LISTING_RESPONSE_CACHE', default='default')
+LISTING_RESPONSE_CACHE_TIMEOUT = env.int('LISTING_RESPONSE_CACHE_TIMEOUT', default=0)
+
+# Lifetime in seconds of cached per-listing representations, which every
+# listing read (anonymous or not) is assembled from (0 disables). Run
+# `manage.py listing_cache_stats` to see the hit rate; its counters live in
+# the cache, so with a per-process cache read them from /metrics instead.
+LISTING_REPRESENTATION_CACHE_TIMEOUT = env.int('LISTING_REPRESENTATION_CACHE_TIMEOUT', default=0)
+
+# The change feed only serves changes older than this many seconds, so that
+# ids taken by transactions still running are not skipped. Writes must
+# commit within it.
+CHANGE_FEED_DELAY = env.int('CHANGE_FEED_DELAY', default=5)
+
+# Materialize booked nights so availability search reads a per-night calendar
+# instead of booking history. Run `manage.py rebuild_calendar` after enabling.
+AVAILABILITY_CALENDAR = env.bool('AVAILABILITY_CALENDAR', default=True)
+
+# Dotted path of the listing search backend. By default SQLite databases use
+# the FTS5 index and other databases fall back to substring matching. SQLite
+# connections missing the index log a warning and fall back too.
+LISTING_SEARCH_BACKEND = env('LISTING_SEARCH_BACKEND', default=None)
+
+# Seconds to cache /api/listings/facets/ responses per filter set (0 disables).
+LISTING_FACETS_CACHE_TIMEOUT = env.int('LISTING_FACETS_CACHE_TIMEOUT', default=0)
+
+# Serialize API reads with precompiled field accessors instead of DRF's
+# per-field lookups; the JSON is the same (see listings/fastread.py).
+FAST_READ_SERIALIZERS = env.bool('FAST_READ_SERIALIZERS', default=True)
+
+# Time each request's SQL, serialization and rendering (see
+# listings/metrics.py): Server-Timing headers, a JSON log line per request and
+# per-route Prometheus histograms at /metrics. Requests taking at least
+# PERFORMANCE_SLOW_REQUEST_MS are logged as warnings, others at INFO level.
+PERFORMANCE_METRICS = env.bool('PERFORMANCE_METRICS', default=True)
+PERFORMANCE_SLOW_REQUEST_MS = env.int('PERFORMANCE_SLOW_REQUEST_MS', default=500)
+
+# With PERFORMANCE_METRICS on, a statement run N_PLUS_ONE_THRESHOLD times in one
+# request (N+1 queries) or taking at least SLOW_QUERY_MS is logged as a warning,
+# with the stack that ran it. 0 turns a check off.
+N_PLUS_ONE_THRESHOLD = env.int('N_PLUS_ONE_THRESHOLD', default=5)
+SLOW_QUERY_MS = env.int('SLOW_QUERY_MS', default=100)
+
+# Bearer token Prometheus sends to read /metrics. Staff users can always read
+# it; without a token, /metrics is a 404 for everyone else.
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Set PERFORMANCE_LOG_LEVEL=INFO to log every request, not only slow ones.
+        'alx_travel_app.performance': {
+            'handlers': ['console'],
+            'level': env('PERFORMANCE_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS', default=[
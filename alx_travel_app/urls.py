@@ -19,6 +19,7 @@ from django.urls import path, include, re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from alx_travel_app.listings.metrics import metrics_view
 
 # Swagger Schema View
 schema_view = get_schema_view(
@@ -37,6 +38,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('alx_travel_app.listings.urls')),
+    path('metrics', metrics_view, name='metrics'),
     
     # Swagger URLs
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', 
@@ -7,18 +7,26 @@ This script demonstrates how to test the API endpoints using requests.
 import requests
 import json
 from datetime import datetime, timedelta
-import base64
 
 # Configuration
 BASE_URL = "http://localhost:8000/api"
 ADMIN_USERNAME = "admin"  # Change this to your admin username
 ADMIN_PASSWORD = "admin"  # Change this to your admin password
 
+_token = None
+
 def get_auth_header():
-    """Get authentication header for API requests."""
-    credentials = f"{ADMIN_USERNAME}:{ADMIN_PASSWORD}"
-    encoded_credentials = base64.b64encode(credentials.encode()).decode()
-    return {"Authorization": f"Basic {encoded_credentials}"}
+    """Get authentication header for API requests, obtaining a token once."""
+    global _token
+    if _token is None:
+        response = requests.post(f"{BASE_URL}/auth/token/", json={
+            "username": ADMIN_USERNAME,
+            "password": ADMIN_PASSWORD,
+            "name": "test_api.py",
+        })
+        response.raise_for_status()
+        _token = response.json()["token"]
+    return {"Authorization": f"Bearer {_token}"}
 
 def test_listings():
     """Test listing endpoints."""